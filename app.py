@@ -3,16 +3,33 @@
 Production-grade Streamlit UI
 """
 
+import html
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
+
 import requests
 import streamlit as st
-from typing import Optional, List, Dict, Any
+from requests.adapters import HTTPAdapter
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # older / newer streamlit layouts
+    add_script_run_ctx = get_script_run_ctx = None
 
 # ═══════════════════════════════════════════════════════════════
 #  CONFIG
 # ═══════════════════════════════════════════════════════════════
 API_BASE = "http://127.0.0.1:8000"
-TMDB_IMG = "https://image.tmdb.org/t/p/w500"
+API_TIMEOUT = 15
+HEALTH_TIMEOUT = 1.5
+HEALTH_TTL = 10
+API_POOL_SIZE = 16
+API_PARALLELISM = 6
+GRID_IMG_SIZE = "w185"  # grids show small posters; srcset lets the browser go up to w500
 PLACEHOLDER_POSTER = "https://via.placeholder.com/500x750?text=No+Poster"
+GRID_ROWS_PER_PAGE = 3
 CATEGORIES = {
     "🔥 Trending": "trending",
     "⭐ Popular": "popular",
@@ -25,6 +42,26 @@ CATEGORIES = {
 if "selected_movie_id" not in st.session_state:
     st.session_state.selected_movie_id = None
 
+if "tfidf_top_n" not in st.session_state:
+    st.session_state.tfidf_top_n = 10
+if "browse_pages" not in st.session_state:
+    st.session_state.browse_pages = 3
+
+# Widgets of the page hidden behind the detail view would be dropped from session state;
+# re-assigning them every run keeps the page, search and paging for "← Back".
+PERSISTENT_KEYS = (
+    "nav_radio", "home_category", "search_query", "tfidf_top_n",
+    "movie_select", "browse_query", "browse_pages",
+)
+for _key in list(st.session_state.keys()):
+    if _key in PERSISTENT_KEYS or str(_key).endswith("_page"):
+        st.session_state[_key] = st.session_state[_key]
+
+# ?movie=<tmdb_id> deep links open the detail view (selecting a card keeps it in the URL)
+_movie_param = st.query_params.get("movie")
+if _movie_param and str(_movie_param).isdigit():
+    st.session_state.selected_movie_id = int(_movie_param)
+
 # ─────────────────────────── PAGE CONFIG ──────────────────────
 st.set_page_config(
     page_title="CineMatch • Movie Recommendations",
@@ -87,6 +124,9 @@ section[data-testid="stSidebar"] .stRadio > label {
     transform: translateY(-6px);
     box-shadow: 0 12px 32px rgba(229,9,20,0.18);
 }
+.poster-card[data-movie] {
+    cursor: pointer;
+}
 .poster-card img {
     width: 100%;
     aspect-ratio: 2/3;
@@ -116,6 +156,14 @@ section[data-testid="stSidebar"] .stRadio > label {
     color: #f5c518;
     font-weight: 600;
 }
+.poster-grid {
+    display: grid;
+    grid-template-columns: repeat(var(--cols, 6), minmax(0, 1fr));
+    gap: 1rem;
+}
+.poster-grid .poster-card {
+    margin-bottom: 0;
+}
 
 /* ── Detail Hero ── */
 .detail-hero {
@@ -262,32 +310,95 @@ div[data-testid="stTextInput"] input:focus {
 
 
 # ─────────────────────────── API HELPERS ──────────────────────
+@st.cache_resource(show_spinner=False)
+def get_session() -> requests.Session:
+    """Process-wide keep-alive connection pool to the backend."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=API_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource(show_spinner=False)
+def get_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=API_PARALLELISM, thread_name_prefix="api")
+
+
+class PartialResponse(Exception):
+    """The backend dropped sections that missed its latency budget. Raised so the answer is not cached."""
+
+    def __init__(self, data: Any):
+        super().__init__("partial response")
+        self.data = data
+
+
+def _fetch(path: str, params: Optional[dict] = None) -> Any:
+    r = get_session().get(f"{API_BASE}{path}", params=params, timeout=API_TIMEOUT)
+    r.raise_for_status()
+    if r.headers.get("X-Partial-Sections"):
+        raise PartialResponse(r.json())
+    return r.json()
+
+
 @st.cache_data(ttl=300, show_spinner=False)
+def _fetch_cached(path: str, params: Optional[dict] = None) -> Any:
+    return _fetch(path, params)
+
+
+def _report_error(e: Exception):
+    if isinstance(e, requests.exceptions.ConnectionError):
+        st.error("⚠️ Backend API is offline. Start it with `uvicorn main:app`")
+    else:
+        st.error(f"API error: {e}")
+
+
 def api_get(path: str, params: Optional[dict] = None) -> Any:
     """Cached GET to backend API."""
     try:
-        r = requests.get(f"{API_BASE}{path}", params=params, timeout=15)
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.ConnectionError:
-        st.error("⚠️ Backend API is offline. Start it with `uvicorn main:app`")
-        return None
+        return _fetch_cached(path, params)
+    except PartialResponse as e:
+        return e.data
     except Exception as e:
-        st.error(f"API error: {e}")
+        _report_error(e)
         return None
 
 
-def api_get_live(path: str, params: Optional[dict] = None) -> Any:
-    """Non-cached GET (for search / dynamic)."""
+def api_get_many(calls: Dict[str, Tuple[str, Optional[dict], bool]]) -> Dict[str, Any]:
+    """
+    Issue independent GETs in parallel: {name: (path, params, cached)} -> {name: json | None}.
+    Errors are reported from the script thread once every call has finished.
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+    def run(fn, path, params):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(path, params)
+
+    executor = get_executor()
+    futures = {
+        name: executor.submit(run, _fetch_cached if cached else _fetch, path, params)
+        for name, (path, params, cached) in calls.items()
+    }
+    results: Dict[str, Any] = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except PartialResponse as e:
+            results[name] = e.data
+        except Exception as e:
+            _report_error(e)
+            results[name] = None
+    return results
+
+
+@st.cache_data(ttl=HEALTH_TTL, show_spinner=False)
+def api_health() -> Optional[int]:
+    """Backend health status code (None when unreachable), cached briefly across reruns."""
     try:
-        r = requests.get(f"{API_BASE}{path}", params=params, timeout=15)
-        r.raise_for_status()
-        return r.json()
-    except requests.exceptions.ConnectionError:
-        st.error("⚠️ Backend API is offline. Start it with `uvicorn main:app`")
-        return None
-    except Exception as e:
-        st.error(f"API error: {e}")
+        return get_session().get(f"{API_BASE}/health", timeout=HEALTH_TIMEOUT).status_code
+    except requests.exceptions.RequestException:
         return None
 
 
@@ -302,15 +413,25 @@ def render_section_header(title: str):
     )
 
 
-def render_poster_card(
+def poster_card_html(
     title: str,
     poster_url: Optional[str],
     release_date: Optional[str] = None,
     vote_average: Optional[float] = None,
     score: Optional[float] = None,
-):
-    """Render a single movie poster card."""
-    poster = poster_url or PLACEHOLDER_POSTER
+    poster_srcset: Optional[str] = None,
+    cols: int = 6,
+    tmdb_id: Optional[int] = None,
+) -> str:
+    """HTML for a single movie poster card (a click target when it carries a tmdb_id)."""
+    poster = html.escape(poster_url or PLACEHOLDER_POSTER, quote=True)
+    srcset_attr = ""
+    if poster_url and poster_srcset:
+        srcset_attr = (
+            f' srcset="{html.escape(poster_srcset, quote=True)}"'
+            f' sizes="(max-width: 768px) 45vw, {math.ceil(100 / cols)}vw"'
+        )
+    title = html.escape(title, quote=True)
     year = release_date[:4] if release_date and len(release_date) >= 4 else "—"
 
     rating_html = ""
@@ -327,9 +448,13 @@ def render_poster_card(
             '</div>'
         )
 
-    html = (
-        '<div class="poster-card">'
-        f'<img src="{poster}" alt="{title}" loading="lazy" />'
+    card_attrs = ""
+    if tmdb_id:
+        card_attrs = f' data-movie="{int(tmdb_id)}" role="button" tabindex="0"'
+
+    return (
+        f'<div class="poster-card"{card_attrs}>'
+        f'<img src="{poster}"{srcset_attr} alt="{title}" loading="lazy" decoding="async" />'
         '<div class="card-body">'
         f'<div class="card-title" title="{title}">{title}</div>'
         '<div class="card-meta">'
@@ -340,16 +465,62 @@ def render_poster_card(
         '</div>'
         '</div>'
     )
-    st.markdown(html, unsafe_allow_html=True)
 
 
+def render_poster_card(
+    title: str,
+    poster_url: Optional[str],
+    release_date: Optional[str] = None,
+    vote_average: Optional[float] = None,
+    score: Optional[float] = None,
+):
+    """Render a single movie poster card."""
+    st.markdown(
+        poster_card_html(title, poster_url, release_date, vote_average, score),
+        unsafe_allow_html=True,
+    )
+
+
+# Clickable grid: the poster cards themselves post the clicked tmdb id back to Python.
+_POSTER_GRID_JS = """
+export default function(component) {
+    const { data, setTriggerValue, parentElement } = component;
+    parentElement.querySelectorAll(":scope > .poster-grid").forEach((el) => el.remove());
+    const grid = document.createElement("div");
+    grid.className = "poster-grid";
+    grid.style.setProperty("--cols", data.cols);
+    grid.innerHTML = data.cards;
+    const open = (e) => {
+        const card = e.target.closest("[data-movie]");
+        if (card) setTriggerValue("clicked", Number(card.dataset.movie));
+    };
+    grid.addEventListener("click", open);
+    grid.addEventListener("keydown", (e) => {
+        if (e.key === "Enter" || e.key === " ") open(e);
+    });
+    parentElement.appendChild(grid);
+    return () => grid.remove();
+}
+"""
+poster_grid_component = st.components.v2.component(
+    "poster_grid", js=_POSTER_GRID_JS, isolate_styles=False
+)
+
+
+@st.fragment
 def render_poster_grid(
     movies: List[Dict],
     cols: int = 6,
     show_score: bool = False,
     clickable: bool = True,
+    key: str = "grid",
+    page_size: Optional[int] = None,
 ):
-    """Render a responsive grid of movie poster cards."""
+    """
+    Render a page of movie poster cards as one HTML block.
+    Runs as a fragment: paging reruns only this grid, not the page's API calls.
+    When clickable, clicking a poster opens the movie's detail view.
+    """
     if not movies:
         st.markdown(
             '<div class="empty-state"><div class="emoji">🎬</div>No movies found</div>',
@@ -357,22 +528,61 @@ def render_poster_grid(
         )
         return
 
-    columns = st.columns(cols)
-    for i, movie in enumerate(movies):
-        with columns[i % cols]:
-            render_poster_card(
-                title=movie.get("title", "Unknown"),
-                poster_url=movie.get("poster_url"),
-                release_date=movie.get("release_date"),
-                vote_average=movie.get("vote_average"),
-                score=movie.get("score") if show_score else None,
-            )
-            # Clickable button to view details
-            tmdb_id = movie.get("tmdb_id")
-            if clickable and tmdb_id:
-                if st.button("📖 Details", key=f"detail_{tmdb_id}_{i}", use_container_width=True):
-                    st.session_state.selected_movie_id = tmdb_id
-                    st.rerun()
+    page_size = page_size or cols * GRID_ROWS_PER_PAGE
+    pages = math.ceil(len(movies) / page_size)
+    page = 1
+    if pages > 1:
+        page = st.radio(
+            "Page",
+            list(range(1, pages + 1)),
+            horizontal=True,
+            key=f"{key}_page",
+            label_visibility="collapsed",
+        )
+    visible = movies[(page - 1) * page_size: page * page_size]
+    clickable = clickable and any(movie.get("tmdb_id") for movie in visible)
+
+    cards = "".join(
+        poster_card_html(
+            title=movie.get("title", "Unknown"),
+            poster_url=movie.get("poster_url"),
+            release_date=movie.get("release_date"),
+            vote_average=movie.get("vote_average"),
+            score=movie.get("score") if show_score else None,
+            poster_srcset=movie.get("poster_srcset"),
+            cols=cols,
+            tmdb_id=movie.get("tmdb_id") if clickable else None,
+        )
+        for movie in visible
+    )
+    if not clickable:
+        st.markdown(
+            f'<div class="poster-grid" style="--cols:{cols}">{cards}</div>',
+            unsafe_allow_html=True,
+        )
+        return
+
+    result = poster_grid_component(
+        data={"cards": cards, "cols": cols},
+        key=f"{key}_grid",
+        on_clicked_change=lambda: None,
+    )
+    if result.clicked:
+        select_movie(result.clicked)
+        # the detail view replaces the whole page, not just this fragment
+        st.rerun()
+
+
+def select_movie(tmdb_id: int):
+    st.session_state.selected_movie_id = int(tmdb_id)
+    # shareable URL; setting query params does not reload the page
+    st.query_params["movie"] = str(int(tmdb_id))
+
+
+def clear_selected_movie():
+    st.session_state.selected_movie_id = None
+    if "movie" in st.query_params:
+        del st.query_params["movie"]
 
 
 def render_movie_detail(detail: Dict):
@@ -463,15 +673,22 @@ def page_home():
         list(CATEGORIES.keys()),
         index=0,
         label_visibility="collapsed",
+        key="home_category",
     )
     category = CATEGORIES[selected_label]
 
+    # One cached call fills every category; switching categories costs no network
     with st.spinner("Loading movies…"):
-        movies = api_get("/home", {"category": category, "limit": 24})
+        feed = api_get("/home/all", {"limit": 24, "img_size": GRID_IMG_SIZE})
+
+    movies = (feed or {}).get("categories", {}).get(category)
+    if movies is None:
+        with st.spinner("Loading movies…"):
+            movies = api_get("/home", {"category": category, "limit": 24, "img_size": GRID_IMG_SIZE})
 
     if movies:
         render_section_header(selected_label)
-        render_poster_grid(movies, cols=6)
+        render_poster_grid(movies, cols=6, key="home")
 
 
 def page_search():
@@ -496,7 +713,7 @@ def page_search():
 
     top_n = st.slider(
         "Number of TF-IDF recommendations",
-        min_value=5, max_value=30, value=10,
+        min_value=5, max_value=30,
         key="tfidf_top_n",
     )
 
@@ -512,7 +729,7 @@ def page_search():
 
     # ── Step 1: TMDB search ──
     with st.spinner("Searching TMDB…"):
-        search_data = api_get_live("/tmdb/search", {"query": query})
+        search_data = api_get("/tmdb/search", {"query": query})
 
     if not search_data or not search_data.get("results"):
         st.warning("No movies found on TMDB for that query.")
@@ -535,22 +752,27 @@ def page_search():
     selected = titles_map[selected_label]
     tmdb_id = selected["id"]
 
-    # ── Step 2: Movie details ──
-    with st.spinner("Fetching movie details…"):
-        detail = api_get(f"/movie/id/{tmdb_id}")
+    # ── Steps 2-4 are independent: fetch details, TF-IDF and genre recs in parallel ──
+    movie_title = selected.get("title", query)
+    with st.spinner("Fetching movie details & recommendations…"):
+        data = api_get_many(
+            {
+                "detail": (f"/movie/id/{tmdb_id}", None, True),
+                "tfidf": ("/recommend/tfidf", {"title": movie_title, "top_n": top_n}, True),
+                "genre": ("/recommend/genre", {"tmdb_id": tmdb_id, "limit": 18, "img_size": GRID_IMG_SIZE}, True),
+            }
+        )
+    detail, tfidf_recs, genre_recs = data["detail"], data["tfidf"], data["genre"]
 
+    # ── Step 2: Movie details ──
     if detail:
         render_movie_detail(detail)
 
     # ── Step 3: TF-IDF recommendations ──
     render_section_header("🤖 AI Content-Based Recommendations (TF-IDF)")
 
-    movie_title = selected.get("title", query)
-    with st.spinner("Computing TF-IDF similarity…"):
-        tfidf_recs = api_get_live("/recommend/tfidf", {"title": movie_title, "top_n": top_n})
-
     if tfidf_recs:
-        render_poster_grid(tfidf_recs, cols=5, show_score=True)
+        render_poster_grid(tfidf_recs, cols=5, show_score=True, key="search_tfidf")
     else:
         st.info(
             f'"{movie_title}" not found in local dataset. '
@@ -560,11 +782,8 @@ def page_search():
     # ── Step 4: Genre recommendations ──
     render_section_header("🎭 More Like This (Genre-Based)")
 
-    with st.spinner("Finding similar genre movies…"):
-        genre_recs = api_get("/recommend/genre", {"tmdb_id": tmdb_id, "limit": 18})
-
     if genre_recs:
-        render_poster_grid(genre_recs, cols=6)
+        render_poster_grid(genre_recs, cols=6, key="search_genre")
     else:
         st.info("No genre-based recommendations available.")
 
@@ -586,35 +805,26 @@ def page_browse_tmdb():
             key="browse_query",
         )
     with col2:
-        page_num = st.number_input("Page", min_value=1, max_value=10, value=1, key="browse_page")
+        depth = st.number_input("Pages", min_value=1, max_value=10, key="browse_pages")
     with col3:
         st.button("Search", use_container_width=True, type="primary", key="browse_btn")
 
     if q:
+        # All pages in one aggregated call; the grid paginates locally
         with st.spinner("Searching…"):
-            data = api_get_live("/tmdb/search", {"query": q, "page": page_num})
+            data = api_get(
+                "/tmdb/search",
+                {"query": q, "pages": f"1-{int(depth)}", "img_size": GRID_IMG_SIZE},
+            )
 
         if data and data.get("results"):
             total = data.get("total_results", 0)
-            st.caption(f"📊 {total:,} results found  •  Page {page_num}")
-
-            movies = []
-            for r in data["results"]:
-                movies.append(
-                    {
-                        "tmdb_id": r.get("id"),
-                        "title": r.get("title", "Unknown"),
-                        "poster_url": (
-                            f"{TMDB_IMG}{r['poster_path']}"
-                            if r.get("poster_path")
-                            else None
-                        ),
-                        "release_date": r.get("release_date"),
-                        "vote_average": r.get("vote_average"),
-                    }
-                )
-
-            render_poster_grid(movies, cols=6)
+            movies = data["results"]
+            st.caption(
+                f"📊 {total:,} results found  •  showing {len(movies)} "
+                f"from {len(data.get('pages_fetched', []))} page(s)"
+            )
+            render_poster_grid(movies, cols=6, key="browse")
         else:
             st.warning("No results found.")
 
@@ -689,11 +899,14 @@ def page_about():
     st.markdown("### 🔌 API Endpoints")
     endpoints = {
         "GET /health": "Health check",
+        "GET /health/ready": "Readiness: 503 until the TF-IDF artifacts are loaded",
         "GET /home": "Home feed (trending / popular / top_rated / now_playing / upcoming)",
+        "GET /home/all": "Every home category in one call",
         "GET /tmdb/search": "TMDB keyword search",
         "GET /movie/id/{tmdb_id}": "Detailed movie info",
         "GET /recommend/tfidf": "TF-IDF content-based recommendations",
         "GET /recommend/genre": "Genre-based recommendations",
+        "GET /movie/search": "Details + TF-IDF + genre recommendations in one call (partial under a latency budget)",
     }
     for endpoint, desc in endpoints.items():
         st.code(endpoint, language=None)
@@ -706,12 +919,18 @@ def page_movie_detail():
 
     # Back button
     if st.button("← Back", key="back_btn"):
-        st.session_state.selected_movie_id = None
+        clear_selected_movie()
         st.rerun()
 
-    # Fetch movie details
+    # Details and genre recs only need the id: fetch them together
     with st.spinner("Fetching movie details…"):
-        detail = api_get(f"/movie/id/{tmdb_id}")
+        data = api_get_many(
+            {
+                "detail": (f"/movie/id/{tmdb_id}", None, True),
+                "genre": ("/recommend/genre", {"tmdb_id": tmdb_id, "limit": 18, "img_size": GRID_IMG_SIZE}, True),
+            }
+        )
+    detail, genre_recs = data["detail"], data["genre"]
 
     if not detail:
         st.error("Could not load movie details.")
@@ -719,14 +938,14 @@ def page_movie_detail():
 
     render_movie_detail(detail)
 
-    # TF-IDF recommendations
+    # TF-IDF recommendations (needs the title from the details)
     movie_title = detail.get("title", "")
     render_section_header("🤖 AI Content-Based Recommendations (TF-IDF)")
     with st.spinner("Computing TF-IDF similarity…"):
-        tfidf_recs = api_get_live("/recommend/tfidf", {"title": movie_title, "top_n": 10})
+        tfidf_recs = api_get("/recommend/tfidf", {"title": movie_title, "top_n": 10})
 
     if tfidf_recs:
-        render_poster_grid(tfidf_recs, cols=5, show_score=True, clickable=False)
+        render_poster_grid(tfidf_recs, cols=5, show_score=True, clickable=False, key="detail_tfidf")
     else:
         st.info(
             f'"{movie_title}" not found in local dataset. '
@@ -735,11 +954,8 @@ def page_movie_detail():
 
     # Genre recommendations
     render_section_header("🎭 More Like This (Genre-Based)")
-    with st.spinner("Finding similar genre movies…"):
-        genre_recs = api_get("/recommend/genre", {"tmdb_id": tmdb_id, "limit": 18})
-
     if genre_recs:
-        render_poster_grid(genre_recs, cols=6)
+        render_poster_grid(genre_recs, cols=6, key="detail_genre")
 
 
 # ─────────────────────────── SIDEBAR ──────────────────────────
@@ -764,19 +980,18 @@ with st.sidebar:
     # Clear detail view when navigating via sidebar
     if st.session_state.selected_movie_id is not None:
         if st.button("← Back to browsing", use_container_width=True):
-            st.session_state.selected_movie_id = None
+            clear_selected_movie()
             st.rerun()
 
     st.markdown("---")
 
-    # Health indicator
-    try:
-        h = requests.get(f"{API_BASE}/health", timeout=3)
-        if h.status_code == 200:
-            st.success("🟢  API Online", icon="✅")
-        else:
-            st.error("🔴  API Error", icon="⚠️")
-    except Exception:
+    # Health indicator (cached for a few seconds, not re-probed on every rerun)
+    health_status = api_health()
+    if health_status == 200:
+        st.success("🟢  API Online", icon="✅")
+    elif health_status is not None:
+        st.error("🔴  API Error", icon="⚠️")
+    else:
         st.error("🔴  API Offline", icon="⚠️")
         st.caption("Run: `uvicorn main:app`")
 
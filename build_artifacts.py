@@ -0,0 +1,318 @@
+"""
+offline pipeline that builds the recommender artifacts consumed by main.py
+
+    python build_artifacts.py --csv movies_metadata.csv --out . --jobs 8
+    python build_artifacts.py --csv movies_metadata.csv --mode hashing --chunksize 100000
+
+writes df.pkl , indices.pkl , tfidf_matrix.pkl , tfidf.pkl and manifest.json
+(version , row count , sha256 of every artifact) which load_pickles validates against.
+
+the csv is streamed in chunks and each cleaned chunk is spilled to a temp dir , so peak
+memory is one chunk plus the model:
+  - tfidf mode   : each process counts one chunk (vocabulary , document and term
+                   frequencies) , the counts are merged into the vocabulary and idf , then
+                   the chunks are transformed in parallel against it. the result equals a
+                   TfidfVectorizer fit on the whole corpus without ever tokenizing it serially
+  - hashing mode : HashingVectorizer needs no vocabulary (constant memory fit) , chunks are
+                   hashed in parallel and a TfidfTransformer fits idf on the stacked counts
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import Pipeline
+
+
+ARTIFACT_FILES = ("df.pkl", "indices.pkl", "tfidf_matrix.pkl", "tfidf.pkl")
+MANIFEST_FILE = "manifest.json"
+
+TEXT_COLUMNS = ("overview", "tagline")
+KEEP_COLUMNS = ("id", "title", "release_date", "popularity", "vote_average", "vote_count")
+
+_GENRE_NAME_RE = re.compile(r"'name':\s*'([^']*)'")
+_GENRE_ID_RE = re.compile(r"'id':\s*(\d+)")
+
+
+"""
+chunk cleaning
+"""
+
+def _genres(raw: Any) -> List[Dict[str, Any]]:
+    """movies_metadata stores genres as a python-literal list of {'id','name'} dicts"""
+    if not isinstance(raw, str) or not raw.startswith("["):
+        return []
+    try:
+        parsed = ast.literal_eval(raw)
+        return [g for g in parsed if isinstance(g, dict)]
+    except (ValueError, SyntaxError):
+        ids = _GENRE_ID_RE.findall(raw)
+        names = _GENRE_NAME_RE.findall(raw)
+        return [{"id": int(i), "name": n} for i, n in zip(ids, names)]
+
+
+def clean_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    chunk = chunk[chunk["title"].notna()].copy()
+    chunk["title"] = chunk["title"].astype(str).str.strip()
+    chunk = chunk[chunk["title"] != ""]
+
+    if "id" in chunk.columns:
+        chunk["id"] = pd.to_numeric(chunk["id"], errors="coerce")
+        chunk = chunk[chunk["id"].notna()]
+        chunk["id"] = chunk["id"].astype(np.int64)
+
+    for col in ("popularity", "vote_average", "vote_count"):
+        if col in chunk.columns:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce").fillna(0).astype(np.float32)
+
+    genres = chunk["genres"].map(_genres) if "genres" in chunk.columns else pd.Series([[]] * len(chunk), index=chunk.index)
+    chunk["genre_names"] = genres.map(lambda gs: "|".join(str(g.get("name", "")) for g in gs))
+    chunk["genre_ids"] = genres.map(lambda gs: "|".join(str(g.get("id", "")) for g in gs))
+
+    parts = [chunk[c].fillna("").astype(str) for c in TEXT_COLUMNS if c in chunk.columns]
+    # genre names are repeated so they weigh in next to the free text
+    parts.append((chunk["genre_names"].str.replace("|", " ", regex=False) + " ") * 2)
+    text = parts[0]
+    for p in parts[1:]:
+        text = text + " " + p
+    chunk["soup"] = text.str.strip()
+
+    keep = [c for c in KEEP_COLUMNS if c in chunk.columns] + ["genre_names", "genre_ids", "soup"]
+    return chunk[keep]
+
+
+def stream_chunks(csv_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [c for c in (*KEEP_COLUMNS, *TEXT_COLUMNS, "genres") if c in header]
+    if "title" not in usecols:
+        raise SystemExit(f"{csv_path} has no 'title' column")
+    for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=chunksize, low_memory=False):
+        cleaned = clean_chunk(chunk)
+        if len(cleaned):
+            yield cleaned
+
+
+def spill_chunks(csv_path: str, chunksize: int, workdir: str) -> List[str]:
+    paths = []
+    for n, chunk in enumerate(stream_chunks(csv_path, chunksize)):
+        path = os.path.join(workdir, f"chunk-{n:05d}.pkl")
+        chunk.to_pickle(path)
+        paths.append(path)
+        print(f"  chunk {n}: {len(chunk):,} rows")
+    return paths
+
+
+"""
+parallel transform (one chunk per task , the vectorizer is shipped once per worker)
+"""
+_WORKER_VECTORIZER : Any = None
+
+
+def _init_worker(vectorizer_blob: bytes) -> None:
+    global _WORKER_VECTORIZER
+    _WORKER_VECTORIZER = pickle.loads(vectorizer_blob)
+
+
+def _transform_chunk(path: str) -> sparse.csr_matrix:
+    texts = pd.read_pickle(path)["soup"].tolist()
+    return sparse.csr_matrix(_WORKER_VECTORIZER.transform(texts), dtype=np.float32)
+
+
+def parallel_transform(vectorizer: Any, paths: List[str], jobs: int) -> sparse.csr_matrix:
+    if jobs <= 1:
+        _init_worker(pickle.dumps(vectorizer))
+        blocks = [_transform_chunk(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(pickle.dumps(vectorizer),)
+        ) as pool:
+            # map keeps chunk order , so row i of the matrix is row i of df
+            blocks = list(pool.map(_transform_chunk, paths))
+    return sparse.vstack(blocks, format="csr", dtype=np.float32)
+
+
+"""
+fitting
+"""
+
+def _count_chunk(path: str) -> Tuple[int, pd.DataFrame]:
+    """(documents , per-term document / total frequency) of one chunk"""
+    texts = pd.read_pickle(path)["soup"].tolist()
+    counter = CountVectorizer(stop_words="english")
+    try:
+        counts = counter.fit_transform(texts).tocsc()
+    except ValueError:  # nothing but stop words
+        return len(texts), pd.DataFrame({"df": [], "tf": []}, dtype=np.int64)
+    return len(texts), pd.DataFrame(
+        {"df": np.diff(counts.indptr), "tf": np.asarray(counts.sum(axis=0)).ravel()},
+        index=counter.get_feature_names_out(),
+    )
+
+
+def fit_vocabulary(
+        paths: List[str], jobs: int, max_features: Optional[int], min_df: int
+) -> Tuple[List[str], np.ndarray]:
+    """
+    merges the per-chunk counts into TfidfVectorizer's vocabulary (min_df , then the
+    max_features most frequent terms , sorted) and its smoothed idf. ties at the
+    max_features cut go to the alphabetically first term (sklearn's pick is arbitrary)
+    """
+    if jobs <= 1:
+        results = [_count_chunk(p) for p in paths]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_count_chunk, paths))
+    n_docs = sum(n for n, _ in results)
+    stats = pd.concat([freq for _, freq in results]).groupby(level=0).sum().sort_index()
+
+    stats = stats[stats["df"] >= min_df]
+    if max_features is not None and len(stats) > max_features:
+        keep = np.argsort(-stats["tf"].to_numpy(), kind="stable")[:max_features]
+        stats = stats.iloc[np.sort(keep)]
+    if stats.empty:
+        raise SystemExit("empty vocabulary: every term is a stop word or below --min-df")
+
+    idf = np.log((1 + n_docs) / (1 + stats["df"].to_numpy(dtype=np.float64))) + 1
+    return stats.index.tolist(), idf
+
+
+def build_tfidf(paths: List[str], jobs: int, max_features: Optional[int], min_df: int):
+    vocabulary, idf = fit_vocabulary(paths, jobs, max_features, min_df)
+    counter = CountVectorizer(stop_words="english", vocabulary=vocabulary)
+    transformer = TfidfTransformer()
+    transformer.idf_ = idf
+    model = Pipeline([("count", counter), ("tfidf", transformer)])
+    matrix = parallel_transform(model, paths, jobs)
+    return model, matrix
+
+
+def build_hashing(paths: List[str], jobs: int, n_features: int):
+    hasher = HashingVectorizer(
+        stop_words="english",
+        n_features=n_features,
+        alternate_sign=False,
+        norm=None,
+        dtype=np.float32,
+    )
+    counts = parallel_transform(hasher, paths, jobs)
+    transformer = TfidfTransformer()
+    matrix = sparse.csr_matrix(transformer.fit_transform(counts), dtype=np.float32)
+    return Pipeline([("hash", hasher), ("tfidf", transformer)]), matrix
+
+
+"""
+output
+"""
+
+def sha256_file(path: str, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for buf in iter(lambda: f.read(block), b""):
+            h.update(buf)
+    return h.hexdigest()
+
+
+def _dump_atomic(obj: Any, path: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def write_artifacts(out_dir: str, df: pd.DataFrame, matrix: sparse.csr_matrix, model: Any, meta: Dict[str, Any]) -> Dict[str, Any]:
+    os.makedirs(out_dir, exist_ok=True)
+    indices = pd.Series(df.index, index=df["title"])
+    # one row per title , the first one wins
+    indices = indices[~indices.index.duplicated()]
+
+    _dump_atomic(df, os.path.join(out_dir, "df.pkl"))
+    _dump_atomic(indices, os.path.join(out_dir, "indices.pkl"))
+    _dump_atomic(matrix, os.path.join(out_dir, "tfidf_matrix.pkl"))
+    _dump_atomic(model, os.path.join(out_dir, "tfidf.pkl"))
+
+    artifacts = {}
+    for name in ARTIFACT_FILES:
+        path = os.path.join(out_dir, name)
+        artifacts[name] = {"sha256": sha256_file(path), "bytes": os.path.getsize(path)}
+
+    digest = hashlib.sha256("".join(a["sha256"] for a in artifacts.values()).encode()).hexdigest()
+    manifest = {
+        "version": digest[:12],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "rows": int(df.shape[0]),
+        "features": int(matrix.shape[1]),
+        "nnz": int(matrix.nnz),
+        **meta,
+        "artifacts": artifacts,
+    }
+    tmp = os.path.join(out_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST_FILE))
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    p = argparse.ArgumentParser(description="Build df.pkl / indices.pkl / tfidf_matrix.pkl / tfidf.pkl + manifest.json")
+    p.add_argument("--csv", required=True, help="movies metadata csv (title, overview, tagline, genres, id, ...)")
+    p.add_argument("--out", default=os.path.dirname(os.path.abspath(__file__)))
+    p.add_argument("--mode", choices=("tfidf", "hashing"), default="tfidf")
+    p.add_argument("--chunksize", type=int, default=50_000)
+    p.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--max-features", type=int, default=None, help="tfidf mode vocabulary cap")
+    p.add_argument("--min-df", type=int, default=1, help="tfidf mode minimum document frequency")
+    p.add_argument("--n-features", type=int, default=2 ** 20, help="hashing mode feature space")
+    p.add_argument("--workdir", default=None, help="where chunks are spilled (default: a temp dir)")
+    args = p.parse_args(argv)
+
+    started = time.time()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="mr-build-")
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        print(f"streaming {args.csv} in chunks of {args.chunksize:,}")
+        paths = spill_chunks(args.csv, args.chunksize, workdir)
+        if not paths:
+            raise SystemExit("no usable rows in the csv")
+
+        print(f"fitting ({args.mode}) with {args.jobs} jobs")
+        if args.mode == "hashing":
+            model, matrix = build_hashing(paths, args.jobs, args.n_features)
+        else:
+            model, matrix = build_tfidf(paths, args.jobs, args.max_features, args.min_df)
+
+        df = pd.concat(
+            (pd.read_pickle(path).drop(columns=["soup"]) for path in paths),
+            ignore_index=True,
+        )
+        if df.shape[0] != matrix.shape[0]:
+            raise SystemExit(f"row mismatch: df has {df.shape[0]} rows , matrix {matrix.shape[0]}")
+
+        manifest = write_artifacts(
+            args.out, df, matrix, model,
+            {"mode": args.mode, "source": os.path.basename(args.csv)},
+        )
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(
+        f"wrote version {manifest['version']}: {manifest['rows']:,} rows , "
+        f"{manifest['features']:,} features , {manifest['nnz']:,} nnz in {time.time() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,658 @@
+"""
+async load generator for the api
+
+    python loadtest.py --spawn --workers 2 --concurrency 1,8,32,64 --duration 20 --out results/w2
+    python loadtest.py --url http://localhost:8000 --mix tfidf=5,details=2 --concurrency 16
+    python loadtest.py --stub-only --stub-port 9100     # just the tmdb stand-in
+
+--spawn starts a local tmdb stand-in (canned payloads , configurable latency and error rate)
+and `uvicorn main:app --workers N` (or serve.py with --prefork) pointed at it through TMDB_BASE , with its caches in a
+temp dir , so a run never touches the real tmdb api. --env KEY=VALUE is passed to the
+spawned server to compare settings. when the server's artifacts fail to load (no df.pkl /
+tfidf_matrix.pkl) the artifact-backed routes (tfidf) are left out of the mix.
+
+each concurrency level is one step of the saturation curve: closed-loop virtual users replay
+the route mix , titles drawn with zipfian popularity from df.pkl (or --titles). per step it
+reports throughput , per-route latency percentiles and error rates plus worker cpu / rss
+(read from /proc , psutil when installed) ; --out writes <out>.csv and <out>.json.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import pickle
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
+
+import httpx
+
+try:
+    import psutil
+except ImportError:  # optional , /proc is read directly
+    psutil = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = "home=2,search=2,details=3,tfidf=4,genre=2"
+HOME_CATEGORIES = ("trending", "popular", "top_rated", "now_playing", "upcoming")
+PERCENTILES = (50, 90, 95, 99)
+
+
+"""
+tmdb stand-in
+"""
+STUB_GENRES = [
+    (28, "Action"), (12, "Adventure"), (16, "Animation"), (35, "Comedy"), (80, "Crime"),
+    (99, "Documentary"), (18, "Drama"), (10751, "Family"), (14, "Fantasy"), (36, "History"),
+    (27, "Horror"), (10402, "Music"), (9648, "Mystery"), (10749, "Romance"),
+    (878, "Science Fiction"), (53, "Thriller"), (10752, "War"), (37, "Western"),
+]
+
+
+def _stub_movie(movie_id: int, title: Optional[str] = None) -> Dict[str, Any]:
+    rng = random.Random(movie_id)
+    genres = rng.sample(STUB_GENRES, 2)
+    return {
+        "id": movie_id,
+        "title": title or f"Movie {movie_id}",
+        "overview": f"Synthetic overview for movie {movie_id}.",
+        "release_date": f"{rng.randint(1960, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "poster_path": f"/p{movie_id}.jpg",
+        "backdrop_path": f"/b{movie_id}.jpg",
+        "vote_average": round(rng.uniform(4, 9), 1),
+        "popularity": round(rng.uniform(1, 500), 2),
+        "genre_ids": [g for g, _ in genres],
+        "genres": [{"id": g, "name": n} for g, n in genres],
+    }
+
+
+def _stub_page(seed: str, page: int, first_title: Optional[str] = None) -> Dict[str, Any]:
+    base = zlib.crc32(f"{seed}:{page}".encode()) % 900_000 + 1000
+    results = [_stub_movie(base + i) for i in range(20)]
+    if first_title:
+        results[0] = _stub_movie(zlib.crc32(first_title.lower().encode()) % 900_000 + 1000, first_title)
+    return {"page": page, "results": results, "total_pages": 50, "total_results": 1000}
+
+
+class TMDBStubHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    jitter = 0.02
+    error_rate = 0.0
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the api cancelled the request (hedge lost , budget spent)
+            pass
+
+    def do_GET(self) -> None:
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            self._send(500, {"status_message": "stub failure"})
+            return
+
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        page = int(q.get("page", "1") or 1)
+        parts = [p for p in url.path.split("/") if p]
+        # tolerate a /3 prefix so TMDB_BASE may point at http://host:port/3
+        if parts and parts[0] == "3":
+            parts = parts[1:]
+
+        if parts == ["genre", "movie", "list"]:
+            self._send(200, {"genres": [{"id": g, "name": n} for g, n in STUB_GENRES]})
+        elif parts == ["search", "movie"]:
+            query = q.get("query", "")
+            self._send(200, _stub_page(f"search:{query}", page, query if page == 1 else None))
+        elif len(parts) == 2 and parts[0] == "movie" and parts[1].isdigit():
+            self._send(200, _stub_movie(int(parts[1])))
+        elif parts and parts[0] in ("trending", "movie", "discover"):
+            self._send(200, _stub_page(url.path + ":" + q.get("with_genres", ""), page))
+        else:
+            self._send(404, {"status_message": "The resource you requested could not be found."})
+
+
+def start_stub(port: int, latency_ms: float, jitter_ms: float, error_rate: float) -> ThreadingHTTPServer:
+    TMDBStubHandler.latency = latency_ms / 1000.0
+    TMDBStubHandler.jitter = jitter_ms / 1000.0
+    TMDBStubHandler.error_rate = error_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), TMDBStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+"""
+spawned server + worker stats
+"""
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(
+        port: int, workers: int, env_overrides: Dict[str, str], cache_dir: Optional[str], prefork: bool = False,
+) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("TMDB_API_KEY", "loadtest")
+    env["WARM_ENABLED"] = "0"
+    if cache_dir is not None:
+        env["TMDB_CACHE_PATH"] = os.path.join(cache_dir, "tmdb_cache.sqlite3")
+        env["SHARED_CACHE_URL"] = "sqlite:///" + os.path.join(cache_dir, "shared_cache.sqlite3")
+        env["IMG_CACHE_DIR"] = os.path.join(cache_dir, "img")
+        # the stand-in's fake discover pages must never reach the real genre index
+        env["GENRE_INDEX_PATH"] = os.path.join(cache_dir, "genre_index.json")
+    env.update(env_overrides)
+    launcher = ["serve.py", "--report-interval", "0"] if prefork else ["-m", "uvicorn", "main:app"]
+    cmd = [
+        sys.executable, *launcher,
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=env, start_new_session=True)
+
+
+def _children(pid: int) -> List[int]:
+    if psutil is not None:
+        try:
+            return [c.pid for c in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return []
+    parents : Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the comm field may contain spaces , ppid is the 2nd field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    out, todo = [], [pid]
+    while todo:
+        for child in parents.get(todo.pop(), []):
+            out.append(child)
+            todo.append(child)
+    return out
+
+
+def worker_pids(master: int) -> List[int]:
+    """uvicorn --workers N forks children ; with a single worker the master serves itself"""
+    return _children(master) or [master]
+
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def proc_cpu_seconds(pid: int) -> Optional[float]:
+    if psutil is not None:
+        try:
+            t = psutil.Process(pid).cpu_times()
+            return t.user + t.system
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 of the full line
+        return (int(fields[11]) + int(fields[12])) / _CLK_TCK
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def proc_rss_bytes(pid: int) -> Optional[int]:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class WorkerMonitor:
+    """cpu% over the step and peak rss per worker , sampled every `interval` seconds"""
+    def __init__(self, pids: List[int], interval: float = 1.0):
+        self.pids = pids
+        self.interval = interval
+        self.peak_rss : Dict[int, int] = {}
+        self._cpu0 : Dict[int, Optional[float]] = {}
+        self._t0 = 0.0
+        self._task : Optional[asyncio.Task] = None
+
+    def _sample_rss(self) -> None:
+        for pid in self.pids:
+            rss = proc_rss_bytes(pid)
+            if rss is not None:
+                self.peak_rss[pid] = max(rss, self.peak_rss.get(pid, 0))
+
+    async def _loop(self) -> None:
+        while True:
+            self._sample_rss()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._t0 = time.monotonic()
+        self._cpu0 = {pid: proc_cpu_seconds(pid) for pid in self.pids}
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> List[Dict[str, Any]]:
+        if self._task is not None:
+            self._task.cancel()
+        self._sample_rss()
+        elapsed = max(time.monotonic() - self._t0, 1e-9)
+        out = []
+        for pid in self.pids:
+            c0, c1 = self._cpu0.get(pid), proc_cpu_seconds(pid)
+            rss = proc_rss_bytes(pid)
+            out.append({
+                "pid": pid,
+                "cpu_pct": round((c1 - c0) / elapsed * 100, 1) if c0 is not None and c1 is not None else None,
+                "rss_mb": round(rss / 2 ** 20, 1) if rss is not None else None,
+                "peak_rss_mb": round(self.peak_rss[pid] / 2 ** 20, 1) if pid in self.peak_rss else None,
+            })
+        return out
+
+
+"""
+traffic
+"""
+
+def load_catalog(titles_path: Optional[str]) -> List[Tuple[str, Optional[int]]]:
+    """(title , tmdb id) most popular first ; ids are None when the source has none"""
+    if titles_path:
+        with open(titles_path) as f:
+            return [(line.strip(), None) for line in f if line.strip()]
+
+    df_path = os.path.join(BASE_DIR, "df.pkl")
+    if os.path.exists(df_path):
+        with open(df_path, "rb") as f:
+            frame = pickle.load(f)
+        for col in ("popularity", "vote_count"):
+            if col in frame.columns:
+                frame = frame.assign(_rank=frame[col].astype(float)).sort_values("_rank", ascending=False)
+                break
+        ids = frame["id"].tolist() if "id" in frame.columns else [None] * len(frame)
+        return [
+            (str(t), int(i) if i == i and i is not None else None)
+            for t, i in zip(frame["title"].tolist(), ids)
+        ]
+
+    print("df.pkl not found , using synthetic titles (tfidf requests will 404 on a server that has the artifacts)", file=sys.stderr)
+    return [(f"Movie {i}", 1000 + i) for i in range(5000)]
+
+
+class ZipfPicker:
+    """rank k is drawn with probability proportional to 1 / k**s (weights built once , shared by all users)"""
+    def __init__(self, n: int, s: float):
+        self.population = range(n)
+        total = 0.0
+        self.cum_weights = []
+        for k in range(1, n + 1):
+            total += 1.0 / k ** s
+            self.cum_weights.append(total)
+
+    def pick(self, rng: random.Random) -> int:
+        return rng.choices(self.population, cum_weights=self.cum_weights)[0]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTE_BUILDERS:
+            raise SystemExit(f"unknown route '{name}' in --mix (one of {', '.join(ROUTE_BUILDERS)})")
+        mix[name] = float(weight or 1)
+    return {k: v for k, v in mix.items() if v > 0}
+
+
+def _tmdb_id(title: str, tmdb_id: Optional[int]) -> int:
+    return tmdb_id if tmdb_id is not None else zlib.crc32(title.lower().encode()) % 900_000 + 1000
+
+
+# routes served from the artifacts , dropped from the mix when the server failed to load them
+ARTIFACT_ROUTES = {"tfidf"}
+
+ROUTE_BUILDERS = {
+    "home": lambda rng, title, tmdb_id: f"/home?category={rng.choice(HOME_CATEGORIES)}&limit=24",
+    "search": lambda rng, title, tmdb_id: f"/tmdb/search?query={quote(title)}",
+    "details": lambda rng, title, tmdb_id: f"/movie/id/{_tmdb_id(title, tmdb_id)}",
+    "tfidf": lambda rng, title, tmdb_id: f"/recommend/tfidf?title={quote(title)}&top_n=10",
+    "genre": lambda rng, title, tmdb_id: f"/recommend/genre?tmdb_id={_tmdb_id(title, tmdb_id)}&limit=18",
+}
+
+
+@dataclass
+class RouteStats:
+    latencies : List[float] = field(default_factory=list)
+    errors : int = 0
+    statuses : Dict[str, int] = field(default_factory=dict)
+
+    def record(self, seconds: float, status: str) -> None:
+        self.latencies.append(seconds)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not status.startswith("2") and status != "304":
+            self.errors += 1
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(stats: RouteStats, elapsed: float) -> Dict[str, Any]:
+    lat = sorted(stats.latencies)
+    n = len(lat)
+    out = {
+        "requests": n,
+        "errors": stats.errors,
+        "error_rate": round(stats.errors / n, 4) if n else 0.0,
+        "rps": round(n / elapsed, 2),
+        **{f"p{p}_ms": round(percentile(lat, p) * 1000, 2) if n else None for p in PERCENTILES},
+        "max_ms": round(lat[-1] * 1000, 2) if n else None,
+        "statuses": dict(sorted(stats.statuses.items())),
+    }
+    return out
+
+
+async def run_step(
+        client: httpx.AsyncClient, mix: Dict[str, float], catalog: List[Tuple[str, Optional[int]]],
+        picker: ZipfPicker, concurrency: int, duration: float, warmup: float, seed: int,
+) -> Tuple[Dict[str, RouteStats], float]:
+    """closed loop: `concurrency` users each send their next request as soon as the last one returns"""
+    routes, weights = list(mix), list(mix.values())
+    stats = {r: RouteStats() for r in routes}
+    measure_from = time.monotonic() + warmup
+    deadline = measure_from + duration
+
+    async def user(n: int) -> None:
+        rng = random.Random(seed * 7919 + n)
+        while time.monotonic() < deadline:
+            route = rng.choices(routes, weights)[0]
+            title, tmdb_id = catalog[picker.pick(rng)]
+            url = ROUTE_BUILDERS[route](rng, title, tmdb_id)
+            t0 = time.monotonic()
+            try:
+                r = await client.get(url)
+                status = str(r.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if t0 >= measure_from:
+                stats[route].record(time.monotonic() - t0, status)
+
+    await asyncio.gather(*(user(n) for n in range(concurrency)))
+    return stats, max(time.monotonic() - measure_from, 1e-9)
+
+
+async def _probe(client: httpx.AsyncClient, path: str, fallback: str) -> Optional[httpx.Response]:
+    try:
+        r = await client.get(path)
+        if r.status_code == 404:
+            r = await client.get(fallback)
+        return r
+    except httpx.HTTPError:
+        return None
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float, server: Optional[subprocess.Popen]) -> Dict[str, Any]:
+    """
+    waits until /health/live answers , then for the artifacts (/health/ready) to load or fail.
+    returns the readiness snapshot ; {"status": "unknown"} on servers without the probe.
+    """
+    deadline = time.monotonic() + timeout
+    snapshot : Dict[str, Any] = {}
+    live = False
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise SystemExit(f"server exited with code {server.returncode} before becoming ready")
+        if not live:
+            r = await _probe(client, "/health/live", "/health")
+            live = r is not None and r.status_code == 200
+        if live:
+            r = await _probe(client, "/health/ready", "/health/ready")
+            if r is not None and r.status_code == 404:
+                return {"status": "unknown"}
+            if r is not None and r.status_code in (200, 503):
+                snapshot = r.json()
+                if r.status_code == 200 or snapshot.get("status") == "failed":
+                    return snapshot
+        await asyncio.sleep(0.5)
+    if not live:
+        raise SystemExit(f"server not up after {timeout:.0f}s")
+    raise SystemExit(
+        f"artifacts still loading after {timeout:.0f}s "
+        f"(stage {snapshot.get('stage')} , {snapshot.get('progress', 0):.0%})"
+    )
+
+
+"""
+reporting
+"""
+CSV_FIELDS = (
+    "concurrency", "route", "requests", "errors", "error_rate", "rps",
+    *(f"p{p}_ms" for p in PERCENTILES), "max_ms", "workers", "cpu_pct", "rss_mb", "peak_rss_mb",
+)
+
+
+def step_rows(step: Dict[str, Any]) -> List[Dict[str, Any]]:
+    workers = step["workers"]
+    cpu = [w["cpu_pct"] for w in workers if w["cpu_pct"] is not None]
+    rss = [w["rss_mb"] for w in workers if w["rss_mb"] is not None]
+    peak = [w["peak_rss_mb"] for w in workers if w["peak_rss_mb"] is not None]
+    common = {
+        "concurrency": step["concurrency"],
+        "workers": len(workers),
+        "cpu_pct": round(sum(cpu), 1) if cpu else None,
+        "rss_mb": round(sum(rss), 1) if rss else None,
+        "peak_rss_mb": round(sum(peak), 1) if peak else None,
+    }
+    rows = []
+    for route, summary in [("all", step["total"]), *step["routes"].items()]:
+        row = {**common, "route": route, **summary}
+        row.pop("statuses", None)
+        rows.append(row)
+    return rows
+
+
+def print_step(step: Dict[str, Any]) -> None:
+    print(f"\nconcurrency {step['concurrency']}  ({step['seconds']:.1f}s)")
+    print(f"  {'route':<8} {'req':>7} {'rps':>8} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}  ms")
+    for row in step_rows(step):
+        print(
+            f"  {row['route']:<8} {row['requests']:>7} {row['rps']:>8.1f} {row['error_rate'] * 100:>6.2f} "
+            + " ".join(f"{row[k]:>8.1f}" if row[k] is not None else f"{'-':>8}" for k in ("p50_ms", "p95_ms", "p99_ms"))
+        )
+    for w in step["workers"]:
+        print(f"  worker {w['pid']}: cpu {w['cpu_pct']}%  rss {w['rss_mb']} MB  peak {w['peak_rss_mb']} MB")
+
+
+def write_results(out: str, config: Dict[str, Any], steps: List[Dict[str, Any]]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out + ".json", "w") as f:
+        json.dump({"config": config, "steps": steps}, f, indent=2)
+    with open(out + ".csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for step in steps:
+            writer.writerows(step_rows(step))
+    print(f"\nwrote {out}.json and {out}.csv")
+
+
+"""
+entry point
+"""
+
+async def run(
+        args: argparse.Namespace, base_url: str, server: Optional[subprocess.Popen], config: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    mix = parse_mix(args.mix)
+    catalog = load_catalog(args.titles)
+    if args.top_titles:
+        catalog = catalog[:args.top_titles]
+    picker = ZipfPicker(len(catalog), args.zipf_s)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        readiness = await wait_ready(client, args.ready_timeout, server)
+        config["artifacts"] = readiness.get("status")
+        if readiness.get("status") == "failed":
+            # tfidf would only measure 503s , run the tmdb-only mix instead
+            print(f"artifacts failed to load ({readiness.get('error')}) , running without: "
+                  f"{', '.join(sorted(ARTIFACT_ROUTES & set(mix)))}", file=sys.stderr)
+            mix = {r: w for r, w in mix.items() if r not in ARTIFACT_ROUTES}
+            if not mix:
+                raise SystemExit("every route in --mix needs the artifacts")
+            config["mix"] = mix
+        pids = [int(p) for p in args.pid.split(",")] if args.pid else (worker_pids(server.pid) if server else [])
+
+        steps = []
+        for n, level in enumerate(levels):
+            monitor = WorkerMonitor(pids)
+            monitor.start()
+            stats, elapsed = await run_step(
+                client, mix, catalog, picker, level, args.duration, args.warmup, args.seed + n
+            )
+            workers = await monitor.stop()
+
+            total = RouteStats()
+            for s in stats.values():
+                total.latencies.extend(s.latencies)
+                total.errors += s.errors
+                for status, count in s.statuses.items():
+                    total.statuses[status] = total.statuses.get(status, 0) + count
+            step = {
+                "concurrency": level,
+                "seconds": round(elapsed, 2),
+                "total": summarize(total, elapsed),
+                "routes": {r: summarize(s, elapsed) for r, s in stats.items()},
+                "workers": workers,
+            }
+            print_step(step)
+            steps.append(step)
+    return steps
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    p = argparse.ArgumentParser(description="Closed-loop load test with saturation curves")
+    p.add_argument("--url", default=None, help="target an already running server (default with --spawn: a local one)")
+    p.add_argument("--spawn", action="store_true", help="start the tmdb stand-in and uvicorn main:app")
+    p.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    p.add_argument("--prefork", action="store_true", help="spawn through serve.py (shared artifacts) instead of uvicorn")
+    p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra env for the spawned server")
+    p.add_argument("--keep-caches", action="store_true", help="spawned server uses the normal cache/ dir instead of a temp one")
+    p.add_argument("--pid", default=None, help="comma separated worker pids to monitor (for --url)")
+    p.add_argument("--mix", default=DEFAULT_MIX, help=f"route weights (default {DEFAULT_MIX})")
+    p.add_argument("--concurrency", default="1,4,16,64", help="comma separated levels , one step each")
+    p.add_argument("--duration", type=float, default=15.0, help="measured seconds per step")
+    p.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds at the start of each step")
+    p.add_argument("--timeout", type=float, default=30.0)
+    p.add_argument("--ready-timeout", type=float, default=180.0)
+    p.add_argument("--titles", default=None, help="one title per line , most popular first (default: df.pkl)")
+    p.add_argument("--top-titles", type=int, default=0, help="only draw from the N most popular titles")
+    p.add_argument("--zipf-s", type=float, default=1.1, help="zipf exponent of title popularity")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--stub-port", type=int, default=0, help="tmdb stand-in port (default: any free port)")
+    p.add_argument("--stub-latency-ms", type=float, default=60.0)
+    p.add_argument("--stub-jitter-ms", type=float, default=25.0)
+    p.add_argument("--stub-error-rate", type=float, default=0.0)
+    p.add_argument("--stub-only", action="store_true", help="only run the tmdb stand-in until interrupted")
+    p.add_argument("--out", default=None, help="write <out>.json and <out>.csv")
+    args = p.parse_args(argv)
+
+    if args.stub_only or args.spawn:
+        stub = start_stub(args.stub_port, args.stub_latency_ms, args.stub_jitter_ms, args.stub_error_rate)
+        stub_url = f"http://127.0.0.1:{stub.server_address[1]}/3"
+        print(f"tmdb stand-in on {stub_url} (TMDB_BASE)")
+        if args.stub_only:
+            try:
+                signal.pause()
+            except KeyboardInterrupt:
+                pass
+            return
+
+    server = None
+    cache_dir = None
+    base_url = args.url
+    if args.spawn:
+        env = dict(e.split("=", 1) for e in args.env)
+        env["TMDB_BASE"] = stub_url
+        cache_dir = None if args.keep_caches else tempfile.mkdtemp(prefix="mr-loadtest-")
+        port = _free_port()
+        server = spawn_server(port, args.workers, env, cache_dir, args.prefork)
+        base_url = base_url or f"http://127.0.0.1:{port}"
+        launcher = "serve.py" if args.prefork else "uvicorn main:app"
+        print(f"spawned {launcher} with {args.workers} worker(s) on {base_url}")
+    elif not base_url:
+        raise SystemExit("pass --url or --spawn")
+
+    config = {
+        "url": base_url,
+        "spawned": args.spawn,
+        "workers": args.workers if args.spawn else None,
+        "launcher": ("serve.py" if args.prefork else "uvicorn") if args.spawn else None,
+        "env": args.env,
+        "mix": parse_mix(args.mix),
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "zipf_s": args.zipf_s,
+        "stub": {
+            "latency_ms": args.stub_latency_ms,
+            "jitter_ms": args.stub_jitter_ms,
+            "error_rate": args.stub_error_rate,
+        } if args.spawn else None,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    try:
+        steps = asyncio.run(run(args, base_url, server, config))
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGTERM)
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                os.killpg(server.pid, signal.SIGKILL)
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if args.out:
+        write_results(args.out, config, steps)
+
+
+if __name__ == "__main__":
+    main()
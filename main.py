@@ -1,8 +1,29 @@
-from fastapi import FastAPI , HTTPException , Query 
+from fastapi import FastAPI , HTTPException , Query , Request , Header , Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse , Response , StreamingResponse
 from dotenv import load_dotenv
+from collections import Counter , OrderedDict , deque
+from contextlib import asynccontextmanager , contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
 import os
+import re
+import json
+import math
+import sqlite3
+import random
+import asyncio
+import sys
+import time
+import hmac
+import gzip
+import base64
+import hashlib
+import socket
+import tempfile
+import threading
+import cProfile
+import pstats
 from pydantic import BaseModel , Field 
 from typing import List , Optional , Annotated , Any , Dict , Tuple
 import pandas as pd
@@ -10,14 +31,63 @@ import httpx
 import numpy as np
 import pickle
 
+try:
+    import orjson
+except ImportError:  # optional , falls back to the stdlib encoder
+    orjson = None
 
 
-app = FastAPI(title="Movie Recommendation System API", version="0.1.0")
+
+"""
+startup / shutdown hooks run from the lifespan handler (on_event is deprecated).
+register with @on_startup / @on_shutdown anywhere in the module ; startup hooks run in
+registration order , shutdown hooks in reverse.
+"""
+_STARTUP_HOOKS : List[Any] = []
+_SHUTDOWN_HOOKS : List[Any] = []
+
+
+def on_startup(fn):
+    _STARTUP_HOOKS.append(fn)
+    return fn
+
+
+def on_shutdown(fn):
+    _SHUTDOWN_HOOKS.append(fn)
+    return fn
+
+
+async def _run_hook(fn) -> None:
+    result = fn()
+    if asyncio.iscoroutine(result):
+        await result
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for fn in _STARTUP_HOOKS:
+        await _run_hook(fn)
+    try:
+        yield
+    finally:
+        for fn in reversed(_SHUTDOWN_HOOKS):
+            await _run_hook(fn)
+
+
+app = FastAPI(title="Movie Recommendation System API", version="0.1.0", lifespan=lifespan)
 load_dotenv()
 api = os.getenv("TMDB_API_KEY")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# point at a local stand-in for load tests (see loadtest.py)
+TMDB_BASE = os.getenv("TMDB_BASE", "https://api.themoviedb.org/3").rstrip("/")
+TMDB_IMG_BASE = os.getenv("TMDB_IMG_BASE", "https://image.tmdb.org/t/p")
+# when set (e.g. http://localhost:8000/img) image urls point at the local /img proxy
+IMG_PROXY_BASE = os.getenv("IMG_PROXY_BASE", "").rstrip("/")
 
-TMDB_BASE = "https://api.themoviedb.org/3"
-TMDB_IMG_500 = "https://image.tmdb.org/t/p/w500"
+POSTER_SIZES = ("w92", "w154", "w185", "w342", "w500", "w780", "original")
+BACKDROP_SIZES = ("w300", "w500", "w780", "w1280", "original")
+SRCSET_SIZES = ("w185", "w342", "w500")
 
 app.add_middleware(
     CORSMiddleware,
@@ -39,20 +109,45 @@ DF_PATH = os.path.join(BASE_DIR, "df.pkl")
 INDICES_PATH = os.path.join(BASE_DIR, "indices.pkl")
 TFIDF_MATRIX_PATH = os.path.join(BASE_DIR, "tfidf_matrix.pkl")
 TFIDF_PATH = os.path.join(BASE_DIR, "tfidf.pkl")
+# written by build_artifacts.py ; optional for hand-made pickles
+MANIFEST_PATH = os.path.join(BASE_DIR, "manifest.json")
+VERIFY_ARTIFACT_CHECKSUMS = os.getenv("VERIFY_ARTIFACT_CHECKSUMS", "1") == "1"
 
 
 df : Optional[pd.DataFrame] = None
 indices_obj : Any = None
 tfidf_matrix : Any = None
-tfidf_obj : Any = None
 
 TITLE_TO_IDX : Optional[Dict[str, int]] = None
+TMDB_TO_IDX : Optional[Dict[int, int]] = None
+# row -> title / tmdb id as flat numpy buffers (see build_row_arrays)
+TITLES : Optional[np.ndarray] = None
+TMDB_IDS : Optional[np.ndarray] = None
+ARTIFACT_VERSION : Optional[str] = None
+
+"""
+artifacts load in the background so tmdb-only routes serve right away ; routes that need
+the model answer 503 + Retry-After until /health/ready flips. LAZY_ARTIFACTS=0 restores
+blocking startup (a failed load then aborts the process). tfidf.pkl (the fitted
+vectorizer) is never loaded , every route ranks rows of tfidf_matrix ; it only takes part
+in the manifest check and the version fingerprint.
+"""
+LAZY_ARTIFACTS = os.getenv("LAZY_ARTIFACTS", "1") == "1"
+ARTIFACT_RETRY_AFTER = int(os.getenv("ARTIFACT_RETRY_AFTER", "5"))
+ARTIFACT_STAGES = ("manifest", "df", "indices", "tfidf_matrix", "lookup_maps")
+ARTIFACT_STATE : Dict[str, Any] = {
+    "status": "pending", "stage": None, "loaded": [], "timings": {},
+    "started_at": None, "ready_at": None, "error": None,
+}
+_ARTIFACT_LOCK = threading.Lock()
+_artifact_task : Optional[asyncio.Task] = None
 
 class TMDBMovieCard(BaseModel):
     tmdb_id: Annotated[int,Field(...,description="The TMDB ID of the movie")]
     title: Annotated[str,Field(...,description="The title of the movie")]
     release_date: Annotated[Optional[str],Field(None,description="The release date of the movie in YYYY-MM-DD format")]
     poster_url: Annotated[Optional[str],Field(None,description="the url of the movie posters")]
+    poster_srcset: Annotated[Optional[str],Field(None,description="srcset with w185/w342/w500 variants of the poster")]
     vote_average : Annotated[Optional[float],Field(None,description="the average rating of the movie on TMDB")]
 
 class TMDBMovieDetails(BaseModel):
@@ -61,6 +156,7 @@ class TMDBMovieDetails(BaseModel):
     release_date: Annotated[Optional[str],Field(None,description="The release date of the movie in YYYY-MM-DD format")]
     overview: Annotated[Optional[str],Field(None,description="A brief summary of the movie's plot")]
     poster_url: Annotated[Optional[str],Field(None,description="the url of the movie posters")]
+    poster_srcset: Annotated[Optional[str],Field(None,description="srcset with w185/w342/w500 variants of the poster")]
     backdrop_url: Annotated[Optional[str],Field(None,description="the url of the movie backdrop")]
     genres: Annotated[List[Dict[str, Any]],Field(...,description="A list of genres associated with the movie")]
 
@@ -71,11 +167,28 @@ class Recommendation(BaseModel):
      tmdb : Annotated[Optional[TMDBMovieCard],Field(None,description="The TMDB movie card information for the recommended movie")]
 
 
+class LikedItem(BaseModel):
+    title : Annotated[Optional[str],Field(None,description="local dataset title of a liked movie")]
+    tmdb_id : Annotated[Optional[int],Field(None,description="TMDB ID of a liked movie (needs an id column in the dataset)")]
+    weight : Annotated[float,Field(1.0,ge=0,description="explicit weight of this item in the profile")]
+    rating : Annotated[Optional[float],Field(None,ge=0,le=10,description="user rating 0-10 , scales the weight by rating/5")]
+    watched_at : Annotated[Optional[float],Field(None,description="unix timestamp , decays the weight with half_life_days")]
+
+
+class ProfileRequest(BaseModel):
+    liked : Annotated[List[LikedItem],Field(...,min_length=1,max_length=1000,description="watch history / liked titles")]
+    top_n : Annotated[int,Field(20,ge=1,le=100,description="number of recommendations")]
+    half_life_days : Annotated[Optional[float],Field(None,gt=0,description="recency half-life applied to watched_at")]
+    exclude_titles : Annotated[List[str],Field(default_factory=list,description="extra titles to leave out (already seen)")]
+    exclude_tmdb_ids : Annotated[List[int],Field(default_factory=list,description="extra TMDB ids to leave out (already seen)")]
+
+
 class SearchBundleResponse(BaseModel):
     query : Annotated[str,Field(...,description="The search query used to find the movie")]
     movie_details : Annotated[TMDBMovieDetails,Field(None,description="The detailed information of the movie found based on the search query")]
     tfidf_recommendations : Annotated[List[Recommendation],Field(...,description="A list of recommended movies based on TF-IDF similarity")]
     genre_recommendations : Annotated[List[TMDBMovieCard],Field(...,description="A list of recommended movies based on genre similarity")]
+    partial : Annotated[List[str],Field(default_factory=list,description="sections dropped because they missed the request budget")]
 
 
 """
@@ -85,16 +198,1083 @@ def _norm_title(t :str) ->str:
     return str(t).strip().lower()
 
 
-def make_img_url(path:Optional[str]) -> Optional[str]:
+def make_img_url(path:Optional[str], size: str = "w500") -> Optional[str]:
     if not path:
         return None
-    return f"{TMDB_IMG_500}{path}"
+    if IMG_PROXY_BASE:
+        return f"{IMG_PROXY_BASE}/{size}{path}"
+    return f"{TMDB_IMG_BASE}/{size}{path}"
+
+
+def make_srcset(path: Optional[str], sizes: Tuple[str, ...] = SRCSET_SIZES) -> Optional[str]:
+    """`<url> 185w, <url> 342w, ...` so the browser picks the smallest poster that fits"""
+    if not path:
+        return None
+    return ", ".join(f"{make_img_url(path, size)} {size[1:]}w" for size in sizes)
+
+
+def poster_size_param(size: str) -> str:
+    if size not in POSTER_SIZES:
+        raise HTTPException(status_code=400, detail=f"img_size must be one of {list(POSTER_SIZES)}")
+    return size
+
+
+"""
+fast response path: payloads built from trusted internal dicts are encoded once with orjson
+(no pydantic re-validation , no jsonable_encoder walk) and can be trimmed with ?fields=a,b,c
+"""
+def json_loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def json_dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def fast_json(payload: Any, status_code: int = 200) -> Response:
+    return Response(json_dumps(payload), status_code=status_code, media_type="application/json")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    out = [f.strip() for f in fields.split(",") if f.strip()]
+    return out or None
+
+
+def project(items: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    if not fields:
+        return items
+    return [{f: item[f] for f in fields if f in item} for item in items]
+
+
+def card_dict(res: Dict[str, Any], img_size: str = "w500") -> Dict[str, Any]:
+    """same shape as TMDBMovieCard , without building the model"""
+    return {
+        "tmdb_id": int(res["id"]),
+        "title": res.get("title") or res.get("name") or "",
+        "release_date": res.get("release_date") or res.get("first_air_date") or None,
+        "poster_url": make_img_url(res.get("poster_path"), img_size),
+        "poster_srcset": make_srcset(res.get("poster_path")),
+        "vote_average": res.get("vote_average"),
+    }
+
+
+def card_dicts_from_results(
+        results: List[dict], limit: int = 20, img_size: str = "w500"
+) -> List[Dict[str, Any]]:
+    return [card_dict(res, img_size) for res in results[:limit]]
+
+
+"""
+client side rate limiting for tmdb.
+one token bucket shared by every tmdb_get call in this process. TMDB_RATE_LIMIT / BURST are
+the node's quota: each worker takes an even share , counted from the live worker leases in
+the shared tier (see _peer_loop) or WEB_CONCURRENCY without one. the interactive lane always
+goes first: background work (enrichment , cache warming , genre discovery) leaves a reserve
+of tokens untouched and yields while any interactive caller is queued.
+429s pause the bucket for Retry-After and halve the rate , successes grow it back (AIMD).
+"""
+LANE_INTERACTIVE = "interactive"
+LANE_BACKGROUND = "background"
+
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_BURST = float(os.getenv("TMDB_RATE_BURST", "20"))
+TMDB_INTERACTIVE_RESERVE = float(os.getenv("TMDB_INTERACTIVE_RESERVE", "5"))
+TMDB_MAX_THROTTLE_WAIT = {
+    LANE_INTERACTIVE: float(os.getenv("TMDB_MAX_THROTTLE_WAIT", "5")),
+    LANE_BACKGROUND: float(os.getenv("TMDB_MAX_THROTTLE_WAIT_BACKGROUND", "60")),
+}
+
+_tmdb_lane : ContextVar[str] = ContextVar("tmdb_lane", default=LANE_INTERACTIVE)
+
+
+@contextmanager
+def tmdb_lane(lane: str):
+    """run the enclosed tmdb calls in the given priority lane"""
+    token = _tmdb_lane.set(lane)
+    try:
+        yield
+    finally:
+        _tmdb_lane.reset(token)
+
+
+class TMDBThrottled(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"throttled, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate: float, burst: float, reserve: float = 0.0, peers: int = 1):
+        self.total_rate = rate
+        self.total_burst = burst
+        self.total_reserve = reserve
+        self.peers = 0
+        self.max_rate = self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting = {LANE_INTERACTIVE: 0, LANE_BACKGROUND: 0}
+        self.throttled = 0
+        self.set_peers(peers)
+
+    def set_peers(self, peers: int) -> None:
+        """this process' share when `peers` processes split the quota (keeps the AIMD backoff)"""
+        peers = max(1, int(peers))
+        if peers == self.peers:
+            return
+        backoff = self.rate / self.max_rate
+        self.peers = peers
+        self.max_rate = self.total_rate / peers
+        self.min_rate = max(self.max_rate / 16, 0.5)
+        self.rate = max(self.min_rate, self.max_rate * backoff)
+        self.burst = max(1.0, self.total_burst / peers)
+        self.reserve = max(0.0, min(self.total_reserve / peers, self.burst - 1))
+        self.tokens = min(self.tokens, self.burst)
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, lane: str = LANE_INTERACTIVE, max_wait: Optional[float] = None) -> float:
+        """
+        waits for a token and returns the seconds spent waiting.
+        raises TMDBThrottled when the wait would exceed max_wait.
+        (single event loop , no await between check and take -> no lock needed)
+        """
+        start = time.monotonic()
+        self.waiting[lane] += 1
+        try:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                floor = 1.0 if lane == LANE_INTERACTIVE else 1.0 + self.reserve
+
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif lane == LANE_BACKGROUND and self.waiting[LANE_INTERACTIVE] > 0:
+                    wait = 1.0 / self.rate
+                elif self.tokens >= floor:
+                    self.tokens -= 1.0
+                    return now - start
+                else:
+                    wait = (floor - self.tokens) / self.rate
+
+                if max_wait is not None and (now - start) + wait > max_wait:
+                    self.throttled += 1
+                    raise TMDBThrottled(wait)
+                await asyncio.sleep(wait)
+        finally:
+            self.waiting[lane] -= 1
+
+    def penalize(self, retry_after: float) -> None:
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + retry_after)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        self.updated = now
+
+    def reward(self) -> None:
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 50)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 2),
+            "max_rate": round(self.max_rate, 2),
+            "peers": self.peers,
+            "tokens": round(self.tokens, 2),
+            "paused_for": max(0.0, round(self.paused_until - time.monotonic(), 2)),
+            "waiting": dict(self.waiting),
+            "throttled": self.throttled,
+        }
+
+
+TMDB_LIMITER = TokenBucketLimiter(
+    TMDB_RATE_LIMIT, TMDB_RATE_BURST, TMDB_INTERACTIVE_RESERVE, int(os.getenv("WEB_CONCURRENCY", "1"))
+)
+
+
+def _parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Retry-After is either delta-seconds or an HTTP date"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+def _throttled_error(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="TMDB rate limit reached, try again shortly",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+"""
+tail latency control for tmdb.
+every GET gets a total deadline (TMDB_TIMEOUT) split into short attempts (TMDB_ATTEMPT_TIMEOUT).
+if an attempt hasn't answered by the route's observed p95 a hedged duplicate is sent ,
+the first response wins and the loser is cancelled. hedges are capped to a fraction of
+traffic (TMDB_HEDGE_MAX_RATIO) so the extra upstream load stays bounded.
+network errors / 5xx / 429 are retried with jittered backoff while the deadline allows.
+"""
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "20"))
+TMDB_ATTEMPT_TIMEOUT = float(os.getenv("TMDB_ATTEMPT_TIMEOUT", "6"))
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "2"))
+TMDB_RETRY_BACKOFF = float(os.getenv("TMDB_RETRY_BACKOFF", "0.2"))
+TMDB_HEDGE_ENABLED = os.getenv("TMDB_HEDGE_ENABLED", "1") == "1"
+TMDB_HEDGE_DEFAULT_DELAY = float(os.getenv("TMDB_HEDGE_DEFAULT_DELAY", "1.0"))
+TMDB_HEDGE_MIN_DELAY = float(os.getenv("TMDB_HEDGE_MIN_DELAY", "0.05"))
+TMDB_HEDGE_MAX_RATIO = float(os.getenv("TMDB_HEDGE_MAX_RATIO", "0.1"))
+TMDB_HEDGE_MIN_SAMPLES = 20
+TMDB_LATENCY_WINDOW = 256
+TMDB_RETRYABLE_STATUS = {500, 502, 503, 504}
+
+TMDB_METRICS : Counter = Counter()
+_TMDB_LATENCIES : Dict[str, deque] = {}
+_http_client : Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """one pooled keep-alive client per process (per-attempt timeouts are passed on each call)"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+    return _http_client
+
+
+def _tmdb_route_key(path: str) -> str:
+    """/movie/550 -> /movie/{id} so all detail calls share one latency window"""
+    return re.sub(r"/\d+", "/{id}", path)
+
+
+def _record_latency(route: str, seconds: float) -> None:
+    window = _TMDB_LATENCIES.get(route)
+    if window is None:
+        window = _TMDB_LATENCIES[route] = deque(maxlen=TMDB_LATENCY_WINDOW)
+    window.append(seconds)
+
+
+def _latency_p95(route: str) -> Optional[float]:
+    window = _TMDB_LATENCIES.get(route)
+    if not window or len(window) < TMDB_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(window)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def _hedge_allowed() -> bool:
+    return TMDB_HEDGE_ENABLED and TMDB_METRICS["hedges"] < TMDB_HEDGE_MAX_RATIO * TMDB_METRICS["requests"]
+
+
+async def _tmdb_send(url: str, q: Dict[str, Any], lane: str, max_wait: float, timeout: float) -> httpx.Response:
+    await TMDB_LIMITER.acquire(lane, max_wait=max_wait)
+    TMDB_METRICS["attempts"] += 1
+    return await get_http_client().get(url, params=q, timeout=timeout)
+
+
+async def _tmdb_hedged_get(
+        route: str, url: str, q: Dict[str, Any], lane: str, max_wait: float, remaining: float
+) -> httpx.Response:
+    """
+    one logical attempt: primary request plus at most one hedge.
+    raises the primary's error only when every in-flight request failed.
+    """
+    if remaining <= 0:
+        raise asyncio.TimeoutError()
+
+    timeout = min(TMDB_ATTEMPT_TIMEOUT, remaining)
+    start = time.monotonic()
+    primary = asyncio.ensure_future(_tmdb_send(url, q, lane, max_wait, timeout))
+    tasks = {primary}
+
+    p95 = _latency_p95(route)
+    hedge_delay = max(TMDB_HEDGE_MIN_DELAY, p95 if p95 is not None else TMDB_HEDGE_DEFAULT_DELAY)
+    hedge : Optional[asyncio.Future] = None
+
+    try:
+        if hedge_delay < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if not done and _hedge_allowed():
+                TMDB_METRICS["hedges"] += 1
+                hedge = asyncio.ensure_future(
+                    _tmdb_send(url, q, lane, max_wait, max(0.001, timeout - hedge_delay))
+                )
+                tasks.add(hedge)
+
+        first_error : Optional[BaseException] = None
+        while tasks:
+            left = timeout - (time.monotonic() - start)
+            if left <= 0:
+                break
+            done, tasks = await asyncio.wait(tasks, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for t in done:
+                if t.exception() is None:
+                    r = t.result()
+                    if t is hedge:
+                        TMDB_METRICS["hedge_wins"] += 1
+                    if r.status_code == 200:
+                        _record_latency(route, time.monotonic() - start)
+                    return r
+                if first_error is None or t is primary:
+                    first_error = t.exception()
+
+        if first_error is not None:
+            raise first_error
+        raise asyncio.TimeoutError()
+    finally:
+        for t in (primary, hedge):
+            if t is not None and not t.done():
+                t.cancel()
+
+
+"""
+per-request state shared with everything the request awaits (incl. gathered tasks ,
+which copy the context but keep pointing at the same dict). used for response markers.
+"""
+_request_state : ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_state", default=None)
+
+
+"""
+latency budgets: a request's deadline is its route budget (ROUTE_BUDGETS , longest matching
+prefix) or the client's X-Request-Budget-Ms , capped at TMDB_TIMEOUT. routes without a budget
+keep tmdb_get's own TMDB_TIMEOUT. tmdb calls made for the request only get the remaining time ,
+and composite routes await their sections through run_section: a section that misses the
+deadline is dropped and listed in X-Partial-Sections (and a `partial` field where the payload
+has one) instead of failing the whole response.
+"""
+BUDGET_HEADER = "X-Request-Budget-Ms"
+PARTIAL_HEADER = "X-Partial-Sections"
+# kept back from the budget to build and send the (partial) response
+DEADLINE_SLACK = 0.05
+
+
+def _parse_route_budgets(raw: str) -> Dict[str, float]:
+    budgets = {}
+    for part in raw.split(","):
+        prefix, _, seconds = part.partition("=")
+        if prefix.strip() and seconds.strip():
+            budgets[prefix.strip()] = float(seconds)
+    return budgets
+
+
+ROUTE_BUDGETS = _parse_route_budgets(os.getenv(
+    "ROUTE_BUDGETS",
+    "/recommend/genre=2.5,/home/all=3,/movie/search=4,/movie/id/=4,/tmdb/search=5",
+))
+
+
+def request_budget(request: Request) -> Optional[float]:
+    raw = request.headers.get(BUDGET_HEADER)
+    if raw:
+        try:
+            ms = float(raw)
+        except ValueError:
+            ms = 0
+        if ms > 0:
+            return min(ms / 1000, TMDB_TIMEOUT)
+    path = request.url.path
+    matches = [prefix for prefix in ROUTE_BUDGETS if path.startswith(prefix)]
+    if not matches:
+        return None
+    return min(ROUTE_BUDGETS[max(matches, key=len)], TMDB_TIMEOUT)
+
+
+def remaining_budget() -> Optional[float]:
+    """seconds left for the current request , None outside a request or without a budget"""
+    state = _request_state.get()
+    if state is None or state.get("deadline") is None:
+        return None
+    return state["deadline"] - time.monotonic()
+
+
+def mark_partial(section: str) -> None:
+    state = _request_state.get()
+    if state is not None and section not in state["partial"]:
+        state["partial"].append(section)
+
+
+def partial_sections() -> List[str]:
+    state = _request_state.get()
+    return list(state["partial"]) if state is not None else []
+
+
+def budget_exceeded(detail: str = "Request budget exhausted") -> HTTPException:
+    return HTTPException(status_code=504, detail=detail)
+
+
+async def run_section(section: str, awaitable, default: Any = None) -> Any:
+    """
+    awaits one section of a composite response within what is left of the budget.
+    on a miss (timeout or a 504 from tmdb_get) the section is marked partial and `default`
+    returned ; any other error propagates as usual.
+    """
+    remaining = remaining_budget()
+    try:
+        if remaining is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, max(0.0, remaining - DEADLINE_SLACK))
+    except asyncio.TimeoutError:
+        TMDB_METRICS["sections_dropped"] += 1
+        mark_partial(section)
+        return default
+    except HTTPException as e:
+        if e.status_code != 504:
+            raise
+        TMDB_METRICS["sections_dropped"] += 1
+        mark_partial(section)
+        return default
+
+
+@app.middleware("http")
+async def request_state_middleware(request: Request, call_next):
+    budget = request_budget(request)
+    state : Dict[str, Any] = {
+        "stale": False,
+        "partial": [],
+        "deadline": time.monotonic() + budget if budget is not None else None,
+    }
+    token = _request_state.set(state)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_state.reset(token)
+
+    if state["stale"]:
+        response.headers["X-TMDB-Stale"] = "1"
+        response.headers["Warning"] = '110 - "Response is Stale"'
+    if state["partial"]:
+        response.headers[PARTIAL_HEADER] = ",".join(state["partial"])
+    return response
+
+
+"""
+circuit breaker around tmdb with serve-stale fallback.
+opens when the failure ratio (errors + calls slower than TMDB_BREAKER_SLOW_CALL) over the last
+TMDB_BREAKER_WINDOW calls crosses TMDB_BREAKER_FAILURE_RATIO. while open calls fail fast ,
+or return the last good copy of the same request marked with X-TMDB-Stale.
+after TMDB_BREAKER_OPEN_SECONDS a few half-open probes decide whether to close again.
+"""
+TMDB_BREAKER_FAILURE_RATIO = float(os.getenv("TMDB_BREAKER_FAILURE_RATIO", "0.5"))
+TMDB_BREAKER_MIN_CALLS = int(os.getenv("TMDB_BREAKER_MIN_CALLS", "10"))
+TMDB_BREAKER_WINDOW = int(os.getenv("TMDB_BREAKER_WINDOW", "50"))
+TMDB_BREAKER_SLOW_CALL = float(os.getenv("TMDB_BREAKER_SLOW_CALL", "8"))
+TMDB_BREAKER_OPEN_SECONDS = float(os.getenv("TMDB_BREAKER_OPEN_SECONDS", "15"))
+TMDB_BREAKER_HALF_OPEN_PROBES = int(os.getenv("TMDB_BREAKER_HALF_OPEN_PROBES", "2"))
+TMDB_STALE_MAX_ENTRIES = int(os.getenv("TMDB_STALE_MAX_ENTRIES", "2000"))
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+            self, failure_ratio: float, min_calls: int, window: int,
+            slow_call: float, open_seconds: float, half_open_probes: int
+    ):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.outcomes : deque = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.probe_successes = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self.probes_in_flight = 0
+            self.probe_successes = 0
+
+        if self.state == self.HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_probes:
+                return False
+            self.probes_in_flight += 1
+        return True
+
+    def record(self, healthy: Optional[bool], seconds: float) -> None:
+        """healthy=None -> neutral outcome (throttled / cancelled) , only frees the probe slot"""
+        failed = None if healthy is None else (not healthy or seconds > self.slow_call)
+
+        if self.state == self.HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if failed:
+                self._open()
+            elif failed is not None:
+                self.probe_successes += 1
+                if self.probe_successes >= self.half_open_probes:
+                    self.state = self.CLOSED
+                    self.outcomes.clear()
+            return
+
+        if failed is None or self.state == self.OPEN:
+            return
+        self.outcomes.append(failed)
+        if (
+            len(self.outcomes) >= self.min_calls
+            and sum(self.outcomes) / len(self.outcomes) >= self.failure_ratio
+        ):
+            self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 1.0
+        return max(0.0, self.open_seconds - (time.monotonic() - self.opened_at))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "recent_failure_ratio": (
+                round(sum(self.outcomes) / len(self.outcomes), 3) if self.outcomes else 0.0
+            ),
+            "times_opened": self.times_opened,
+            "retry_after": round(self.retry_after(), 1) if self.state == self.OPEN else None,
+        }
+
+
+TMDB_BREAKER = CircuitBreaker(
+    TMDB_BREAKER_FAILURE_RATIO,
+    TMDB_BREAKER_MIN_CALLS,
+    TMDB_BREAKER_WINDOW,
+    TMDB_BREAKER_SLOW_CALL,
+    TMDB_BREAKER_OPEN_SECONDS,
+    TMDB_BREAKER_HALF_OPEN_PROBES,
+)
+
+_TMDB_STALE : "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def _tmdb_cache_key(path: str, params: Dict[str, Any]) -> str:
+    """stable key for a tmdb request (api key excluded)"""
+    return path + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+
+
+def _remember_good(key: str, data: Dict[str, Any]) -> None:
+    _TMDB_STALE[key] = data
+    _TMDB_STALE.move_to_end(key)
+    while len(_TMDB_STALE) > TMDB_STALE_MAX_ENTRIES:
+        _TMDB_STALE.popitem(last=False)
+
+
+def _serve_stale(key: str) -> Optional[Dict[str, Any]]:
+    data = _TMDB_STALE.get(key)
+    if data is None and TMDB_DISK_CACHE is not None:
+        # expired rows stay on disk until evicted , good enough during an outage
+        row = TMDB_DISK_CACHE.get(key, allow_expired=True)
+        if row is not None and row[0] == 200:
+            data = json_loads(row[1])
+    if data is None:
+        return None
+    TMDB_METRICS["served_stale"] += 1
+    state = _request_state.get()
+    if state is not None:
+        state["stale"] = True
+    return data
+
+
+"""
+persistent tmdb response cache (sqlite in WAL mode) shared by every worker on the node
+and surviving restarts. rows carry their own expiry , the file is capped at TMDB_CACHE_MAX_MB
+with least-recently-used eviction. negative results are cached too: 404s (unknown movie ids)
+and searches with no results (titles attach_tmdb_card_by_title can't resolve) get the shorter
+TMDB_NEGATIVE_TTL ; an empty feed / discover page keeps its path ttl , it's usually transient.
+expired rows stay TMDB_STALE_GRACE longer as the serve-stale fallback.
+any sqlite error degrades to a cache miss.
+"""
+TMDB_CACHE_ENABLED = os.getenv("TMDB_CACHE_ENABLED", "1") == "1"
+TMDB_CACHE_PATH = os.getenv("TMDB_CACHE_PATH", os.path.join(BASE_DIR, "cache", "tmdb_cache.sqlite3"))
+TMDB_CACHE_MAX_MB = float(os.getenv("TMDB_CACHE_MAX_MB", "256"))
+TMDB_CACHE_DEFAULT_TTL = float(os.getenv("TMDB_CACHE_DEFAULT_TTL", "3600"))
+TMDB_NEGATIVE_TTL = float(os.getenv("TMDB_NEGATIVE_TTL", "3600"))
+TMDB_STALE_GRACE = float(os.getenv("TMDB_STALE_GRACE", "21600"))
+
+# first matching prefix wins
+TMDB_CACHE_TTLS : List[Tuple[str, float]] = [
+    ("/trending/", 600),
+    ("/movie/now_playing", 1800),
+    ("/movie/upcoming", 1800),
+    ("/movie/popular", 1800),
+    ("/movie/top_rated", 6 * 3600),
+    ("/movie/", 24 * 3600),
+    ("/genre/", 7 * 24 * 3600),
+    ("/search/", 6 * 3600),
+    ("/discover/", 3600),
+]
+
+
+def _tmdb_ttl(path: str, data: Any) -> float:
+    ttl = TMDB_CACHE_DEFAULT_TTL
+    for prefix, path_ttl in TMDB_CACHE_TTLS:
+        if path.startswith(prefix):
+            ttl = path_ttl
+            break
+    empty = isinstance(data, dict) and "results" in data and not data.get("results")
+    if empty and path.startswith("/search/"):
+        return min(ttl, TMDB_NEGATIVE_TTL)
+    return ttl
+
+
+class TMDBDiskCache:
+    TOUCH_INTERVAL = 60.0
+    EVICT_EVERY = 200
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tmdb_cache ("
+                " key TEXT PRIMARY KEY,"
+                " status INTEGER NOT NULL,"
+                " body BLOB NOT NULL,"
+                " fetched_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " last_access REAL NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS tmdb_cache_lru ON tmdb_cache(last_access)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, allow_expired: bool = False) -> Optional[Tuple[int, bytes, bool]]:
+        """returns (status , body , fresh) or None"""
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT status, body, expires_at, last_access FROM tmdb_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            status, body, expires_at, last_access = row
+            now = time.time()
+            fresh = expires_at > now
+            if not fresh and not allow_expired:
+                return None
+            if now - last_access > self.TOUCH_INTERVAL:
+                conn.execute("UPDATE tmdb_cache SET last_access = ? WHERE key = ?", (now, key))
+            return int(status), bytes(body), fresh
+        except sqlite3.Error:
+            TMDB_METRICS["disk_cache_errors"] += 1
+            return None
+
+    def put(self, key: str, status: int, body: bytes, ttl: float) -> None:
+        try:
+            now = time.time()
+            self._conn().execute(
+                "INSERT OR REPLACE INTO tmdb_cache"
+                " (key, status, body, fetched_at, expires_at, last_access, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, body, now, now + ttl, now, len(body) + len(key)),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self.evict()
+        except sqlite3.Error:
+            TMDB_METRICS["disk_cache_errors"] += 1
+
+    def evict(self) -> int:
+        """drops expired rows , then least recently used ones until 90% of the cap"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # keep expired rows a while longer: they are the serve-stale fallback
+            removed = conn.execute(
+                "DELETE FROM tmdb_cache WHERE expires_at < ?", (time.time() - TMDB_STALE_GRACE,)
+            ).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM tmdb_cache").fetchone()[0]
+            target = int(self.max_bytes * 0.9)
+            while total > self.max_bytes:
+                rows = conn.execute(
+                    "SELECT key, size FROM tmdb_cache ORDER BY last_access LIMIT 500"
+                ).fetchall()
+                if not rows:
+                    break
+                for k, size in rows:
+                    conn.execute("DELETE FROM tmdb_cache WHERE key = ?", (k,))
+                    removed += 1
+                    total -= size
+                    if total <= target:
+                        break
+                if total <= target:
+                    break
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        TMDB_METRICS["disk_cache_evicted"] += removed
+        return removed
+
+    def snapshot(self) -> Dict[str, Any]:
+        try:
+            rows, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tmdb_cache"
+            ).fetchone()
+        except sqlite3.Error:
+            return {"path": self.path, "error": True}
+        return {"path": self.path, "rows": rows, "bytes": size, "max_bytes": self.max_bytes}
+
+
+TMDB_DISK_CACHE : Optional[TMDBDiskCache] = (
+    TMDBDiskCache(TMDB_CACHE_PATH, int(TMDB_CACHE_MAX_MB * 1024 * 1024)) if TMDB_CACHE_ENABLED else None
+)
+
+
+"""
+cross-worker shared cache tier for computed results (tfidf rankings) and , when it points at
+redis , tmdb payloads as well. keys are namespaced blake2b digests so every worker (and node)
+derives the same key. backends:
+  SHARED_CACHE_URL=sqlite:///path/shared.sqlite3  (default , node local , mmap'ed WAL file)
+  SHARED_CACHE_URL=redis://host:6379/0            (needs the redis package , evicts via maxmemory)
+  SHARED_CACHE_URL=none                           (per-process caches only)
+a failing backend is skipped for SHARED_CACHE_RETRY seconds , callers keep their per-process LRU.
+"""
+try:
+    import redis
+except ImportError:  # optional
+    redis = None
+
+SHARED_CACHE_URL = os.getenv(
+    "SHARED_CACHE_URL", "sqlite:///" + os.path.join(BASE_DIR, "cache", "shared_cache.sqlite3")
+)
+SHARED_CACHE_MAX_MB = float(os.getenv("SHARED_CACHE_MAX_MB", "512"))
+SHARED_CACHE_RETRY = float(os.getenv("SHARED_CACHE_RETRY", "30"))
+TMDB_L1_SIZE = int(os.getenv("TMDB_L1_SIZE", "1024"))
+TMDB_L1_TTL = float(os.getenv("TMDB_L1_TTL", "30"))
+
+
+class _SQLiteKV:
+    remote = False
+    EVICT_EVERY = 200
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={self.max_bytes}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS kv_expiry ON kv(expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    def count(self, prefix: str) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM kv WHERE substr(key, 1, ?) = ? AND expires_at > ?",
+            (len(prefix), prefix, time.time()),
+        ).fetchone()[0]
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at, size) VALUES (?, ?, ?, ?)",
+            (key, value, time.time() + ttl, len(value) + len(key)),
+        )
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        """expired rows first , then the entries closest to expiry until 90% of the cap"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM kv").fetchone()[0]
+            target = int(self.max_bytes * 0.9)
+            if total > self.max_bytes:
+                for k, size in conn.execute("SELECT key, size FROM kv ORDER BY expires_at").fetchall():
+                    if total <= target:
+                        break
+                    conn.execute("DELETE FROM kv WHERE key = ?", (k,))
+                    total -= size
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class _RedisKV:
+    remote = True
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(key, value, ex=max(1, int(ttl)))
+
+    def count(self, prefix: str) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=prefix + "*", count=100))
+
+
+class SharedCache:
+    def __init__(self, backend: Any):
+        self.backend = backend
+        self.disabled_until = 0.0
+        self.stats : Counter = Counter()
+
+    @property
+    def remote(self) -> bool:
+        return bool(self.backend is not None and self.backend.remote)
+
+    @staticmethod
+    def key(namespace: str, *parts: Any) -> str:
+        """same inputs -> same key in every process (unlike hash() , which is salted per process)"""
+        digest = hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+        return f"mr:{namespace}:{digest}"
+
+    def _usable(self) -> bool:
+        return self.backend is not None and time.monotonic() >= self.disabled_until
+
+    def _failed(self) -> None:
+        self.stats["errors"] += 1
+        self.disabled_until = time.monotonic() + SHARED_CACHE_RETRY
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self._usable():
+            return None
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            self._failed()
+            return None
+        self.stats["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        if not self._usable():
+            return
+        try:
+            self.backend.set(key, value, ttl)
+            self.stats["sets"] += 1
+        except Exception:
+            self._failed()
+
+    def count(self, prefix: str) -> Optional[int]:
+        """live keys starting with prefix , None when the backend is unavailable"""
+        if not self._usable():
+            return None
+        try:
+            return self.backend.count(prefix)
+        except Exception:
+            self._failed()
+            return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__ if self.backend is not None else None,
+            "available": self._usable(),
+            **dict(self.stats),
+        }
+
+
+def _make_shared_cache(url: str) -> SharedCache:
+    if url.startswith("sqlite:///"):
+        return SharedCache(_SQLiteKV(url[len("sqlite:///"):], int(SHARED_CACHE_MAX_MB * 1024 * 1024)))
+    if url.startswith(("redis://", "rediss://", "unix://")) and redis is not None:
+        return SharedCache(_RedisKV(url))
+    # "none" , or redis requested without the package: per-process caches only
+    return SharedCache(None)
+
+
+SHARED_CACHE = _make_shared_cache(SHARED_CACHE_URL)
+
+
+"""
+worker leases for the tmdb quota: every TMDB_PEER_HEARTBEAT seconds each process renews a
+key under this host's prefix in the shared tier and resizes TMDB_LIMITER to its share of the
+live leases. a worker that dies stops renewing and drops out after 3 heartbeats.
+"""
+TMDB_PEER_HEARTBEAT = float(os.getenv("TMDB_PEER_HEARTBEAT", "5"))
+TMDB_PEER_PREFIX = f"mr:tmdb_peer:{socket.gethostname()}:"
+_peer_task : Optional[asyncio.Task] = None
+
+
+def _peer_lease(ttl: float) -> Optional[int]:
+    SHARED_CACHE.set(f"{TMDB_PEER_PREFIX}{os.getpid()}", b"1", ttl)
+    return SHARED_CACHE.count(TMDB_PEER_PREFIX)
+
+
+async def _peer_loop() -> None:
+    while True:
+        peers = await asyncio.to_thread(_peer_lease, 3 * TMDB_PEER_HEARTBEAT)
+        if peers:
+            TMDB_LIMITER.set_peers(peers)
+        await asyncio.sleep(TMDB_PEER_HEARTBEAT)
+
+
+@on_startup
+async def start_peer_leases():
+    global _peer_task
+    if api:
+        _peer_task = asyncio.create_task(_peer_loop())
+
+
+@on_shutdown
+async def stop_peer_leases():
+    if _peer_task is not None:
+        _peer_task.cancel()
+        # hand the share back right away instead of after the lease expires
+        await asyncio.to_thread(_peer_lease, 0)
+
+# per-process front for tmdb payloads: (expires_at , status , payload)
+_TMDB_L1 : "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+
+
+def _tmdb_l1_get(key: str) -> Optional[Tuple[int, Any]]:
+    entry = _TMDB_L1.get(key)
+    if entry is None:
+        return None
+    if entry[0] <= time.monotonic():
+        _TMDB_L1.pop(key, None)
+        return None
+    _TMDB_L1.move_to_end(key)
+    return entry[1], entry[2]
+
+
+def _tmdb_l1_put(key: str, status: int, payload: Any) -> None:
+    _TMDB_L1[key] = (time.monotonic() + TMDB_L1_TTL, status, payload)
+    _TMDB_L1.move_to_end(key)
+    while len(_TMDB_L1) > TMDB_L1_SIZE:
+        _TMDB_L1.popitem(last=False)
+
+
+def _tmdb_error_from_cache(status: int, body: bytes) -> HTTPException:
+    return HTTPException(
+        status_code=502,
+        detail=f"TMDB API error: {status} : {body.decode('utf-8', 'replace')}"
+    )
 
 
 """
 used to bring moviuee detailz
 """
 
+async def _tmdb_fetch(path: str, q: Dict[str, Any]) -> httpx.Response:
+    """
+    retry / hedge loop. returns the final upstream response (anything but 429 / 5xx),
+    raises 502 (network / 5xx) or 503 (throttled) once the retries or the deadline run out
+    """
+    lane = _tmdb_lane.get()
+    max_wait = TMDB_MAX_THROTTLE_WAIT.get(lane, TMDB_MAX_THROTTLE_WAIT[LANE_INTERACTIVE])
+    route = _tmdb_route_key(path)
+    url = f"{TMDB_BASE}{path}"
+    total = TMDB_TIMEOUT
+    budget = remaining_budget()
+    if budget is not None:
+        # only what the request has left , not a fresh TMDB_TIMEOUT
+        if budget <= DEADLINE_SLACK:
+            TMDB_METRICS["budget_exhausted"] += 1
+            raise budget_exceeded("Request budget exhausted before the TMDB call")
+        total = min(total, budget - DEADLINE_SLACK)
+    budget_bound = total < TMDB_TIMEOUT
+    deadline = time.monotonic() + total
+    TMDB_METRICS["requests"] += 1
+
+    attempt = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        backoff : Optional[float] = None
+        try:
+            r = await _tmdb_hedged_get(route, url, q, lane, min(max_wait, remaining), remaining)
+        except TMDBThrottled as e:
+            raise _throttled_error(e.retry_after)
+        except (httpx.RequestError, asyncio.TimeoutError) as e:
+            error = HTTPException(
+                status_code=502,
+                detail=f"TMDB request error:{type(e).__name__} | {repr(e)}"
+            )
+        else:
+            if r.status_code == 429:
+                TMDB_METRICS["throttled_429"] += 1
+                retry_after = _parse_retry_after(r.headers.get("Retry-After"))
+                TMDB_LIMITER.penalize(retry_after)
+                error = _throttled_error(retry_after)
+                if retry_after > max_wait:
+                    raise error
+                # the limiter itself holds the next attempt until Retry-After has passed
+                backoff = 0.0
+            elif r.status_code in TMDB_RETRYABLE_STATUS:
+                error = HTTPException(
+                    status_code=502,
+                    detail=f"TMDB API error: {r.status_code} : {r.text}"
+                )
+            else:
+                TMDB_LIMITER.reward()
+                break
+
+        attempt += 1
+        if backoff is None:
+            # full jitter
+            backoff = random.uniform(0, TMDB_RETRY_BACKOFF * (2 ** (attempt - 1)))
+        if attempt > TMDB_MAX_RETRIES or time.monotonic() + backoff >= deadline:
+            TMDB_METRICS["errors"] += 1
+            if budget_bound and time.monotonic() + backoff >= deadline and error.status_code == 502:
+                TMDB_METRICS["budget_exhausted"] += 1
+                raise budget_exceeded(f"TMDB call exceeded the request budget ({error.detail})")
+            raise error
+        TMDB_METRICS["retries"] += 1
+        await asyncio.sleep(backoff)
+
+    return r
+
+
 async def tmdb_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Docstring for tmdb_get
@@ -108,6 +1288,8 @@ async def tmdb_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[s
 
     network errors -> 502
     tmdb apu error -> 502 with details
+    tmdb throttling (429) / local rate limit exhausted -> 503 with Retry-After
+    circuit open -> last good copy (X-TMDB-Stale header) or 503 fail-fast
     """
 
     if not api:
@@ -117,58 +1299,108 @@ async def tmdb_get(path: str, params: Optional[Dict[str, Any]] = None) -> Dict[s
         )
 
     q = dict(params or {})
+    key = _tmdb_cache_key(path, q)
     q["api_key"] = api
 
-    try:
-        async with httpx.AsyncClient(timeout=20) as client:
-            r = await client.get(f"{TMDB_BASE}{path}", params=q)
-    except httpx.RequestError as e:
+    hit = _tmdb_l1_get(key)
+    if hit is not None:
+        TMDB_METRICS["l1_hits"] += 1
+        if hit[0] != 200:
+            TMDB_METRICS["negative_cache_hits"] += 1
+            raise _tmdb_error_from_cache(hit[0], hit[1])
+        return hit[1]
+
+    if TMDB_DISK_CACHE is not None:
+        row = await asyncio.to_thread(TMDB_DISK_CACHE.get, key)
+        if row is not None:
+            status, body = row[0], row[1]
+            TMDB_METRICS["disk_cache_hits"] += 1
+            if status != 200:
+                TMDB_METRICS["negative_cache_hits"] += 1
+                _tmdb_l1_put(key, status, body)
+                raise _tmdb_error_from_cache(status, body)
+            data = json_loads(body)
+            _tmdb_l1_put(key, 200, data)
+            return data
+        TMDB_METRICS["disk_cache_misses"] += 1
+
+    shared_key = SharedCache.key("tmdb", key)
+    if SHARED_CACHE.remote:
+        body = await asyncio.to_thread(SHARED_CACHE.get, shared_key)
+        if body is not None:
+            TMDB_METRICS["shared_cache_hits"] += 1
+            data = json_loads(body)
+            _tmdb_l1_put(key, 200, data)
+            return data
+
+    if not TMDB_BREAKER.allow():
+        TMDB_METRICS["breaker_rejected"] += 1
+        stale = _serve_stale(key)
+        if stale is not None:
+            return stale
         raise HTTPException(
-            status_code=502,
-            detail=f"TMDB request error:{type(e).__name__} | {repr(e)}"
+            status_code=503,
+            detail="TMDB is currently unavailable (circuit open), try again shortly",
+            headers={"Retry-After": str(max(1, math.ceil(TMDB_BREAKER.retry_after())))},
         )
-    
+
+    start = time.monotonic()
+    healthy : Optional[bool] = False
+    try:
+        r = await _tmdb_fetch(path, q)
+        healthy = True
+    except HTTPException as e:
+        if e.status_code not in (502, 504):
+            # throttling says nothing about upstream health
+            healthy = None
+            raise
+        if e.status_code == 504:
+            # cut short by the caller's budget , not necessarily an upstream failure
+            healthy = None
+        stale = _serve_stale(key)
+        if stale is not None:
+            return stale
+        raise
+    except asyncio.CancelledError:
+        healthy = None
+        raise
+    finally:
+        TMDB_BREAKER.record(healthy, time.monotonic() - start)
+
     if r.status_code != 200:
+        if r.status_code == 404:
+            _tmdb_l1_put(key, 404, r.content)
+            if TMDB_DISK_CACHE is not None:
+                await asyncio.to_thread(TMDB_DISK_CACHE.put, key, 404, r.content, TMDB_NEGATIVE_TTL)
         raise HTTPException(
             status_code=502,
             detail=f"TMDB API error: {r.status_code} : {r.text}"
         )
-    return r.json()
-
-
-"""
-used to convert tmdb search results into movie cards
-"""
-
-async def tmdb_cards_from_results(
-        results: List[dict] , limit: int = 20
-) -> List[TMDBMovieCard]:
-    out: List[TMDBMovieCard] = []
-
-    for res in results[:limit]:
-        out.append(
-            TMDBMovieCard(
-                tmdb_id = int(res["id"]),
-                title= res.get("title") or res.get("name") or "",
-                poster_url= make_img_url(res.get("poster_path")),
-                release_date= res.get("release_date") or res.get("first_air_date") or None,
-                vote_average= res.get("vote_average")
-            )
-        )
-    return out
-
+    data = json_loads(r.content)
+    _remember_good(key, data)
+    _tmdb_l1_put(key, 200, data)
+    ttl = _tmdb_ttl(path, data)
+    if TMDB_DISK_CACHE is not None:
+        await asyncio.to_thread(TMDB_DISK_CACHE.put, key, 200, r.content, ttl)
+    if SHARED_CACHE.remote:
+        await asyncio.to_thread(SHARED_CACHE.set, shared_key, r.content, ttl)
+    return data
 
 
 """
 used to get detailed movie information from tmdb based on movie id
 """
-async def tmdb_movie_details(movie_id:int) -> TMDBMovieDetails:
+async def tmdb_movie_details(
+        movie_id:int, poster_size: str = "w500", backdrop_size: str = "w500"
+) -> TMDBMovieDetails:
     data = await tmdb_get(f"/movie/{movie_id}",{"language":"en-US"})
+    GENRE_INDEX.learn(int(data["id"]), [g["id"] for g in data.get("genres") or [] if "id" in g])
     return TMDBMovieDetails(
         tmdb_id = int(data["id"]),
         title= data.get("title") or data.get("name") or "",
-        poster_url= make_img_url(data.get("poster_path")),
-        backdrop_url= make_img_url(data.get("backdrop_path")),
+        poster_url= make_img_url(data.get("poster_path"), poster_size),
+        poster_srcset= make_srcset(data.get("poster_path")),
+        backdrop_url= make_img_url(data.get("backdrop_path"), backdrop_size),
         release_date= data.get("release_date") or data.get("first_air_date") or None,
         overview= data.get("overview"),
         genres= data.get("genres",[]) or [],
@@ -189,6 +1421,104 @@ async def tmdb_search_movie(query:str, page:int=1) -> Dict[str, Any]:
          "include_adult": False},
          )
 
+"""
+aggregated search: several result pages fetched concurrently (at most SEARCH_CONCURRENCY in
+flight) , merged in page order , de-duplicated by id and optionally re-ranked by popularity
+or by whether the title exists in the local tf-idf dataset.
+"""
+SEARCH_MAX_PAGES = 10
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "4"))
+SEARCH_SORTS = {"relevance", "popularity", "local"}
+
+
+def parse_pages(spec: str) -> List[int]:
+    """page spec like 1-5 , 1,3,4 or a mix -> sorted unique page numbers (1..SEARCH_MAX_PAGES)"""
+    parts = spec.split(",")
+    if len(parts) > SEARCH_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"pages takes at most {SEARCH_MAX_PAGES} entries")
+    out = set()
+    try:
+        for part in parts:
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                lo, hi = (int(x) for x in part.split("-", 1))
+            else:
+                lo = hi = int(part)
+            # bounds first , a spec like 1-999999999 must never reach range()
+            if not 1 <= lo <= hi <= SEARCH_MAX_PAGES:
+                raise HTTPException(status_code=400, detail=f"pages must be within 1-{SEARCH_MAX_PAGES}")
+            out.update(range(lo, hi + 1))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="pages must look like 1-5 or 1,2,4")
+    if not out:
+        raise HTTPException(status_code=400, detail=f"pages must be within 1-{SEARCH_MAX_PAGES}")
+    return sorted(out)
+
+
+def has_local_title(title: str) -> bool:
+    return TITLE_TO_IDX is not None and _norm_title(title) in TITLE_TO_IDX
+
+
+async def aggregate_search(
+        query: str, pages: List[int], max_results: Optional[int], sort: str, img_size: str
+) -> Dict[str, Any]:
+    sem = asyncio.Semaphore(SEARCH_CONCURRENCY)
+
+    async def fetch(p: int) -> Dict[str, Any]:
+        async with sem:
+            return await tmdb_search_movie(query, page=p)
+
+    responses = await asyncio.gather(*(fetch(p) for p in pages), return_exceptions=True)
+
+    seen = set()
+    merged : List[Dict[str, Any]] = []
+    errors : Dict[str, Any] = {}
+    total_results = 0
+    total_pages = 0
+    for p, res in zip(pages, responses):
+        if isinstance(res, BaseException):
+            errors[str(p)] = {
+                "status": res.status_code if isinstance(res, HTTPException) else 500,
+                "detail": res.detail if isinstance(res, HTTPException) else str(res),
+            }
+            continue
+        total_results = max(total_results, int(res.get("total_results") or 0))
+        total_pages = max(total_pages, int(res.get("total_pages") or 0))
+        for r in res.get("results", []):
+            rid = r.get("id")
+            if rid is None or rid in seen:
+                continue
+            seen.add(rid)
+            card = card_dict(r, img_size)
+            card["popularity"] = r.get("popularity")
+            card["has_tfidf"] = has_local_title(card["title"])
+            merged.append(card)
+
+    if errors and not merged:
+        first = next(iter(errors.values()))
+        raise HTTPException(status_code=first["status"], detail=first["detail"])
+
+    if sort == "popularity":
+        merged.sort(key=lambda c: c.get("popularity") or 0.0, reverse=True)
+    elif sort == "local":
+        # stable: keeps tmdb relevance order within each group
+        merged.sort(key=lambda c: not c["has_tfidf"])
+
+    if max_results is not None:
+        merged = merged[:max_results]
+
+    return {
+        "query": query,
+        "results": merged,
+        "pages_fetched": [p for p in pages if str(p) not in errors],
+        "total_results": total_results,
+        "total_pages": total_pages,
+        "errors": errors,
+    }
+
+
 """
 very first search result from tmdb search, used to find movie id based on search query, used in search bundle endpoint
 """
@@ -198,6 +1528,277 @@ async def tmdb_search_first(query:str) -> Optional[dict]:
     return results[0] if results else None
 
 
+"""
+request shapes shared by the routes and the cache warmer (same path + params -> same cache key)
+"""
+HOME_CATEGORIES = ("trending", "popular", "top_rated", "upcoming", "now_playing")
+
+
+def home_feed_request(category: str) -> Tuple[str, Dict[str, Any]]:
+    if category == "trending":
+        return "/trending/movie/day", {"language": "en-US"}
+    return f"/movie/{category}", {"language": "en-US", "page": 1}
+
+
+async def tmdb_discover_genre(genre_id: int, page: int = 1) -> Dict[str, Any]:
+    return await tmdb_get(
+        "/discover/movie",
+        {
+            "with_genres": genre_id,
+            "language": "en-US",
+            "sort_by": "popularity.desc",
+            "page": page,
+        },
+    )
+
+
+"""
+local genre index: genre id -> popular movies (discover snapshots , refreshed in the
+background every GENRE_INDEX_REFRESH seconds) and tmdb id -> genre ids (from the dataset's
+genre_ids column , snapshot results and every details payload we see). persisted to
+GENRE_INDEX_PATH so restarts and sibling workers start warm. /recommend/genre answers from
+memory and only falls back to tmdb for movies or genres the index doesn't know yet.
+"""
+GENRE_INDEX_ENABLED = os.getenv("GENRE_INDEX_ENABLED", "1") == "1"
+GENRE_INDEX_PATH = os.getenv("GENRE_INDEX_PATH", os.path.join(BASE_DIR, "cache", "genre_index.json"))
+GENRE_INDEX_REFRESH = float(os.getenv("GENRE_INDEX_REFRESH", str(6 * 3600)))
+GENRE_INDEX_PAGES = max(1, min(5, int(os.getenv("GENRE_INDEX_PAGES", "2"))))
+GENRE_INDEX_DEPTH = int(os.getenv("GENRE_INDEX_DEPTH", "100"))
+GENRE_INDEX_CONCURRENCY = max(1, int(os.getenv("GENRE_INDEX_CONCURRENCY", "3")))
+GENRE_BLEND_K = 60
+GENRE_CARD_KEYS = ("id", "title", "release_date", "poster_path", "vote_average", "popularity", "genre_ids")
+
+
+class GenreIndex:
+    def __init__(self, path: str):
+        self.path = path
+        self.by_genre : Dict[int, List[Dict[str, Any]]] = {}
+        self.movie_genres : Dict[int, List[int]] = {}
+        self.updated_at : Optional[float] = None
+        self.local_movies = 0
+        self.hits = 0
+        self.misses = 0
+        self._loaded_mtime : Optional[float] = None
+
+    def genres_for(self, tmdb_id: int) -> Optional[List[int]]:
+        return self.movie_genres.get(int(tmdb_id))
+
+    def learn(self, tmdb_id: int, genre_ids: List[int]) -> None:
+        if genre_ids:
+            self.movie_genres[int(tmdb_id)] = [int(g) for g in genre_ids]
+
+    def learn_results(self, results: List[Dict[str, Any]]) -> None:
+        for res in results:
+            if res.get("id") and res.get("genre_ids"):
+                self.learn(res["id"], res["genre_ids"])
+
+    def add_local(self, frame: Optional[pd.DataFrame]) -> None:
+        """tmdb id -> genres from the dataset (build_artifacts.py writes genre_ids as '28|12')"""
+        if frame is None or "genre_ids" not in frame.columns:
+            return
+        col = "tmdb_id" if "tmdb_id" in frame.columns else "id" if "id" in frame.columns else None
+        if col is None:
+            return
+        local : Dict[int, List[int]] = {}
+        ids = pd.to_numeric(frame[col], errors="coerce").to_numpy()
+        for movie_id, raw in zip(ids, frame["genre_ids"].tolist()):
+            if np.isnan(movie_id) or not isinstance(raw, str) or not raw:
+                continue
+            local[int(movie_id)] = [int(g) for g in raw.split("|") if g.isdigit()]
+        # upstream payloads are fresher than the dataset , keep them on top
+        local.update(self.movie_genres)
+        self.movie_genres = local
+        self.local_movies = len(local)
+
+    def set_genre(self, genre_id: int, results: List[Dict[str, Any]]) -> None:
+        seen = set()
+        entries = []
+        for res in results:
+            if not res.get("id") or res["id"] in seen:
+                continue
+            seen.add(res["id"])
+            entries.append({k: res.get(k) for k in GENRE_CARD_KEYS})
+        self.by_genre[int(genre_id)] = entries[:GENRE_INDEX_DEPTH]
+        self.learn_results(entries)
+
+    def blend(self, genre_ids: List[int], exclude: int, limit: int) -> List[Dict[str, Any]]:
+        """reciprocal rank fusion over the genre lists: movies popular in several of the genres win"""
+        scores : Dict[int, float] = {}
+        entries : Dict[int, Dict[str, Any]] = {}
+        for g in genre_ids:
+            for rank, res in enumerate(self.by_genre.get(int(g), [])):
+                movie_id = int(res["id"])
+                if movie_id == exclude:
+                    continue
+                scores[movie_id] = scores.get(movie_id, 0.0) + 1.0 / (GENRE_BLEND_K + rank)
+                entries.setdefault(movie_id, res)
+        ranked = sorted(scores, key=lambda m: -scores[m])
+        return [entries[m] for m in ranked[:limit]]
+
+    def stale(self) -> bool:
+        return self.updated_at is None or time.time() - self.updated_at > GENRE_INDEX_REFRESH
+
+    def load(self) -> bool:
+        """picks up the file when it's newer than what we have (another worker may have refreshed)"""
+        try:
+            mtime = os.path.getmtime(self.path)
+            if self._loaded_mtime is not None and mtime <= self._loaded_mtime:
+                return False
+            with open(self.path, "rb") as f:
+                data = json_loads(f.read())
+        except (OSError, ValueError):
+            return False
+        self.by_genre = {int(g): entries for g, entries in data.get("genres", {}).items()}
+        snapshot_genres = {int(m): gs for m, gs in data.get("movie_genres", {}).items()}
+        snapshot_genres.update(self.movie_genres)
+        self.movie_genres = snapshot_genres
+        self.updated_at = data.get("updated_at")
+        self._loaded_mtime = mtime
+        return True
+
+    def save(self) -> None:
+        """atomic publish ; only the movies learned from tmdb , the dataset part is rebuilt on load"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # runs in a thread: work on copies , the event loop may add genres meanwhile
+        by_genre , movie_genres = dict(self.by_genre) , dict(self.movie_genres)
+        snapshot_ids = {int(res["id"]) for entries in by_genre.values() for res in entries}
+        payload = {
+            "updated_at": self.updated_at,
+            "genres": {str(g): entries for g, entries in by_genre.items()},
+            "movie_genres": {str(m): movie_genres[m] for m in snapshot_ids if m in movie_genres},
+        }
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(json_dumps(payload))
+        os.replace(tmp, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "genres": len(self.by_genre),
+            "movies_per_genre": GENRE_INDEX_DEPTH,
+            "known_movies": len(self.movie_genres),
+            "local_movies": self.local_movies,
+            "updated_at": self.updated_at,
+            "stale": self.stale(),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+GENRE_INDEX = GenreIndex(GENRE_INDEX_PATH)
+_genre_index_task : Optional[asyncio.Task] = None
+
+
+async def refresh_genre_index() -> int:
+    """discover snapshots for every tmdb genre , in the background lane. returns the genre count"""
+    sem = asyncio.Semaphore(GENRE_INDEX_CONCURRENCY)
+
+    async def fetch(genre_id: int, page: int) -> List[Dict[str, Any]]:
+        async with sem:
+            try:
+                return (await tmdb_discover_genre(genre_id, page)).get("results", [])
+            except HTTPException:
+                return []
+
+    async def snapshot(genre_id: int) -> None:
+        pages = await asyncio.gather(*(fetch(genre_id, p) for p in range(1, GENRE_INDEX_PAGES + 1)))
+        results = [res for page in pages for res in page]
+        if results:
+            GENRE_INDEX.set_genre(genre_id, results)
+
+    with tmdb_lane(LANE_BACKGROUND):
+        genre_list = await tmdb_get("/genre/movie/list", {"language": "en-US"})
+        genre_ids = [int(g["id"]) for g in genre_list.get("genres", []) if "id" in g]
+        await asyncio.gather(*(snapshot(g) for g in genre_ids))
+
+    GENRE_INDEX.updated_at = time.time()
+    await asyncio.to_thread(GENRE_INDEX.save)
+    return len(genre_ids)
+
+
+async def _genre_index_loop() -> None:
+    while True:
+        # a sibling worker may have refreshed the file in the meantime
+        await asyncio.to_thread(GENRE_INDEX.load)
+        if GENRE_INDEX.stale():
+            try:
+                await refresh_genre_index()
+            except Exception:
+                pass
+        await asyncio.sleep(min(GENRE_INDEX_REFRESH, 600))
+
+
+@on_startup
+async def start_genre_index():
+    global _genre_index_task
+    await asyncio.to_thread(GENRE_INDEX.load)
+    if GENRE_INDEX_ENABLED and api:
+        _genre_index_task = asyncio.create_task(_genre_index_loop())
+
+
+@on_shutdown
+async def stop_genre_index():
+    if _genre_index_task is not None:
+        _genre_index_task.cancel()
+
+
+"""
+popular movies across the genres of the given movie , as card dicts.
+answered from GENRE_INDEX ; tmdb is only asked for an unknown movie's genres or a genre
+without a snapshot yet (and the answer is kept in the index). those upstream calls run
+within the request budget: a genre that misses it or fails upstream is left out of the
+blend (partial "genre") ; the error only surfaces when no genre is left to blend.
+"""
+async def genre_recommendation_cards(
+        tmdb_id: int, limit: int, img_size: str = "w500",
+        details: "Optional[asyncio.Future[Optional[TMDBMovieDetails]]]" = None,
+) -> List[Dict[str, Any]]:
+    """
+    `details` is a details fetch the caller already started (run through run_section) ;
+    when the index doesn't know the movie's genres it is awaited instead of a second fetch.
+    """
+    genre_ids = GENRE_INDEX.genres_for(tmdb_id)
+    upstream = False
+    if genre_ids is None:
+        if details is None:
+            details = run_section("genre", tmdb_movie_details(tmdb_id))
+        details = await details
+        if details is None:
+            mark_partial("genre")
+            return []
+        genre_ids = [int(g["id"]) for g in details.genres if "id" in g]
+        upstream = True
+    if not genre_ids:
+        return []
+
+    async def snapshot(genre_id: int) -> None:
+        with tmdb_lane(LANE_BACKGROUND):
+            discover = await tmdb_discover_genre(genre_id)
+        GENRE_INDEX.set_genre(genre_id, discover.get("results", []))
+
+    missing = [g for g in genre_ids if g not in GENRE_INDEX.by_genre]
+    if missing:
+        upstream = True
+        results = await asyncio.gather(
+            *(run_section("genre", snapshot(g)) for g in missing), return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for e in errors:
+            if not isinstance(e, Exception):
+                raise e
+        if errors:
+            mark_partial("genre")
+            if not any(g in GENRE_INDEX.by_genre for g in genre_ids):
+                raise errors[0]
+
+    if upstream:
+        GENRE_INDEX.misses += 1
+    else:
+        GENRE_INDEX.hits += 1
+    return [card_dict(res, img_size) for res in GENRE_INDEX.blend(genre_ids, int(tmdb_id), limit)]
+
+
 """
 indices_pkl can be:
 takes data from dict(title -> index)
@@ -228,15 +1829,22 @@ def build_title_to_idx_map(indices : Any) -> Dict[str,int]:
         )
 
 
+def build_tmdb_to_idx_map(frame: Optional[pd.DataFrame]) -> Optional[Dict[int, int]]:
+    """tmdb id -> row position , when the dataset carries an id / tmdb_id column"""
+    if frame is None:
+        return None
+    col = "tmdb_id" if "tmdb_id" in frame.columns else "id" if "id" in frame.columns else None
+    if col is None:
+        return None
+    ids = pd.to_numeric(frame[col], errors="coerce").to_numpy()
+    return {int(v): pos for pos, v in enumerate(ids) if not np.isnan(v)}
+
+
 def get_local_idx_by_title(title:str) -> int:
     global TITLE_TO_IDX
 
-    if TITLE_TO_IDX is None:
-        raise HTTPException(
-            status_code=500,
-            detail="Internal server error: title_to_idx map not initialized"
-        )
-    
+    require_artifacts()
+
     key = _norm_title(title)
     if key in TITLE_TO_IDX:
         return int(TITLE_TO_IDX[key])
@@ -246,38 +1854,102 @@ def get_local_idx_by_title(title:str) -> int:
     )
 
 
-def tfidf_recommend_titles(
-        query_title : str, top_k: int = 10
+"""
+per-query ranking cache: the first request for a row computes its TFIDF_RANK_DEPTH best
+candidates once , every later top_n / page is a slice. keyed by (row index , model version)
+in a bounded LRU ; filled by live traffic and the cache warmer.
+"""
+TFIDF_RANK_DEPTH = int(os.getenv("TFIDF_RANK_DEPTH", "500"))
+TFIDF_RANKING_CACHE_SIZE = int(os.getenv("TFIDF_RANKING_CACHE_SIZE", "1024"))
+TFIDF_SHARED_TTL = 7 * 24 * 3600
+_TFIDF_RANKINGS : "OrderedDict[Tuple[int, Optional[str]], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+
+
+async def tfidf_ranking(idx: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(row indices , scores) of the best TFIDF_RANK_DEPTH matches for row idx , self excluded"""
+    key = (int(idx), ARTIFACT_VERSION)
+    cached = _TFIDF_RANKINGS.get(key)
+    if cached is not None:
+        _TFIDF_RANKINGS.move_to_end(key)
+        return cached
+
+    shared_key = SharedCache.key("tfidf_rank", int(idx), ARTIFACT_VERSION, TFIDF_RANK_DEPTH)
+    # the shared tier may be sqlite on disk , keep it off the event loop
+    packed = await asyncio.to_thread(SHARED_CACHE.get, shared_key)
+    if packed is not None:
+        # int32 row indices followed by float32 scores
+        n = len(packed) // 8
+        ranking = (
+            np.frombuffer(packed, dtype=np.int32, count=n).astype(np.int64),
+            np.frombuffer(packed, dtype=np.float32, count=n, offset=4 * n),
+        )
+    else:
+        qv = tfidf_matrix[idx]
+        scores = (tfidf_matrix @qv.T).toarray().flatten()
+        scores[idx] = -np.inf
+
+        depth = min(TFIDF_RANK_DEPTH, len(scores) - 1)
+        if depth <= 0:
+            ranking = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        else:
+            top = np.argpartition(-scores, depth - 1)[:depth]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            ranking = (top, scores[top].astype(np.float32))
+        await asyncio.to_thread(
+            SHARED_CACHE.set,
+            shared_key,
+            ranking[0].astype(np.int32).tobytes() + ranking[1].tobytes(),
+            TFIDF_SHARED_TTL,
+        )
+
+    _TFIDF_RANKINGS[key] = ranking
+    while len(_TFIDF_RANKINGS) > TFIDF_RANKING_CACHE_SIZE:
+        _TFIDF_RANKINGS.popitem(last=False)
+    return ranking
+
+
+def _ranked_titles(order: np.ndarray, scores: np.ndarray) -> List[Tuple[str, float]]:
+    out : List[Tuple[str, float]] = []
+    for i, score in zip(order.tolist(), scores.tolist()):
+        if not 0 <= i < len(TITLES):
+            continue
+        out.append((str(TITLES[i]), float(score)))
+    return out
+
+
+async def tfidf_recommend_titles(
+        query_title : str, top_k: int = 10, offset: int = 0
 ) -> List[Tuple[str, float]]:
     """
     returns list of (title , score) tuples for top_k recommendations based on tfidf similarity
+    (starting at rank `offset` , for pagination)
     """
-    global df , tfidf_matrix
-    if df is None or tfidf_matrix is None:
-        raise HTTPException(
-            status_code=500,
-            detail="Internal server error: TF-IDF data not loaded"
-        )
-    
+    require_artifacts()
     idx = get_local_idx_by_title(query_title)
+    return await tfidf_page(idx, offset, top_k)
 
-    qv = tfidf_matrix[idx]
-    scores = (tfidf_matrix @qv.T).toarray().flatten()
 
-    order =np.argsort(-scores)
+async def tfidf_page(idx: int, offset: int, size: int) -> List[Tuple[str, float]]:
+    order, scores = await tfidf_ranking(idx)
+    return _ranked_titles(order[offset:offset + size], scores[offset:offset + size])
 
-    out : List[Tuple[str, float]] = []
-    for i in order:
-        if int(i) == int(idx):
-            continue
-        try:
-            title_i = str(df.iloc[int(i)]["title"])
-        except Exception:
-            continue
-        out.append((title_i, float(scores[int(i)])))
-        if len(out) >= top_k:
-            break
-    return out
+
+def encode_cursor(idx: int, offset: int) -> str:
+    raw = json_dumps({"r": int(idx), "o": int(offset), "v": ARTIFACT_VERSION})
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        data = json_loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        idx, offset, version = int(data["r"]), int(data["o"]), data.get("v")
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if version != ARTIFACT_VERSION:
+        raise HTTPException(status_code=409, detail="Cursor belongs to a different model version, start over")
+    if offset < 0 or tfidf_matrix is None or not 0 <= idx < tfidf_matrix.shape[0]:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return idx, offset
 
 
 
@@ -287,15 +1959,17 @@ uses tmdb search by title too fetch poster for a local title.
 if not found , returns none(never crashes at the endpoint)
 """
 
-async def attach_tmdb_card_by_title(title: str) -> Optional[TMDBMovieCard]:
+async def attach_tmdb_card_by_title(title: str, img_size: str = "w500") -> Optional[TMDBMovieCard]:
     try:
-        m = await tmdb_search_first(title)
+        with tmdb_lane(LANE_BACKGROUND):
+            m = await tmdb_search_first(title)
         if not m:
             return None
         return TMDBMovieCard(
             tmdb_id=int(m["id"]),
             title=m.get("title") or title,
-            poster_url=make_img_url(m.get("poster_path")),
+            poster_url=make_img_url(m.get("poster_path"), img_size),
+            poster_srcset=make_srcset(m.get("poster_path")),
             release_date=m.get("release_date") or None,
             vote_average=m.get("vote_average"),
         )
@@ -304,36 +1978,268 @@ async def attach_tmdb_card_by_title(title: str) -> Optional[TMDBMovieCard]:
         return None
     
 
-@app.on_event("startup")
-def load_pickles():
-    global df , indices_obj , tfidf_matrix , tfidf_obj , TITLE_TO_IDX
+def artifact_version(paths: List[str]) -> str:
+    """cheap fingerprint of the model files (name , size , mtime) , changes on every rebuild"""
+    h = hashlib.sha1()
+    for path in paths:
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{int(st.st_mtime)};".encode())
+    return h.hexdigest()[:12]
 
-    with open(DF_PATH,"rb") as f:
-        df = pickle.load(f)
 
-    with open(INDICES_PATH,"rb") as f:
-        indices_obj = pickle.load(f)
-    
+def _sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
 
-    with open(TFIDF_MATRIX_PATH,"rb") as f:
-        tfidf_matrix = pickle.load(f)
 
-    with open(TFIDF_PATH,"rb") as f:
-        tfidf_obj = pickle.load(f)
+def read_manifest() -> Optional[Dict[str, Any]]:
+    """
+    checks the artifact files against manifest.json (sizes always , sha256 unless
+    VERIFY_ARTIFACT_CHECKSUMS=0). returns None when there is no manifest.
+    """
+    if not os.path.exists(MANIFEST_PATH):
+        return None
+    with open(MANIFEST_PATH) as f:
+        manifest = json.load(f)
+
+    for path in (DF_PATH, INDICES_PATH, TFIDF_MATRIX_PATH, TFIDF_PATH):
+        name = os.path.basename(path)
+        expected = manifest.get("artifacts", {}).get(name)
+        if expected is None:
+            raise RuntimeError(f"manifest.json does not list {name}")
+        size = os.path.getsize(path)
+        if size != expected["bytes"]:
+            raise RuntimeError(f"{name} is {size} bytes , manifest expects {expected['bytes']}")
+        if VERIFY_ARTIFACT_CHECKSUMS and _sha256_file(path) != expected["sha256"]:
+            raise RuntimeError(f"{name} checksum does not match manifest.json")
+    return manifest
+
+
+def artifacts_ready() -> bool:
+    return ARTIFACT_STATE["status"] == "ready"
+
+
+def require_artifacts() -> None:
+    if artifacts_ready():
+        return
+    if ARTIFACT_STATE["status"] == "failed":
+        raise HTTPException(
+            status_code=503,
+            detail=f"Recommendation artifacts failed to load: {ARTIFACT_STATE['error']}"
+        )
+    raise HTTPException(
+        status_code=503,
+        detail="Recommendation artifacts are still loading",
+        headers={"Retry-After": str(ARTIFACT_RETRY_AFTER)},
+    )
+
+
+def artifact_snapshot() -> Dict[str, Any]:
+    state = ARTIFACT_STATE
+    total = None
+    if state["started_at"] is not None and state["ready_at"] is not None:
+        total = round(state["ready_at"] - state["started_at"], 3)
+    return {
+        "status": state["status"],
+        "stage": state["stage"],
+        "progress": round(len(state["loaded"]) / len(ARTIFACT_STAGES), 2),
+        "loaded": list(state["loaded"]),
+        "timings": dict(state["timings"]),
+        "load_seconds": total,
+        "error": state["error"],
+        "version": ARTIFACT_VERSION,
+        "rows": int(len(df)) if df is not None else None,
+    }
+
+
+def _load_pickle(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+@contextmanager
+def _artifact_stage(name: str):
+    ARTIFACT_STATE["stage"] = name
+    started = time.perf_counter()
+    yield
+    ARTIFACT_STATE["timings"][name] = round(time.perf_counter() - started, 3)
+    ARTIFACT_STATE["loaded"].append(name)
+
+
+def build_row_arrays(frame: pd.DataFrame) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    titles as a fixed width unicode array and tmdb ids as int64 (-1 when missing). reading
+    them never increfs an object owned by the parent , so prefork workers (serve.py) keep
+    sharing these pages instead of copying them on first touch like df's object columns.
+    """
+    titles = np.asarray(frame["title"].astype(str).tolist(), dtype=str)
+    col = "tmdb_id" if "tmdb_id" in frame.columns else "id" if "id" in frame.columns else None
+    if col is None:
+        return titles, None
+    ids = pd.to_numeric(frame[col], errors="coerce").fillna(-1).astype(np.int64).to_numpy()
+    return titles, ids
+
+
+def load_pickles() -> None:
+    """
+    blocking , staged load of the recommender artifacts. the globals are only published once
+    every stage passed , so a request never sees a half loaded model. a no-op once ready
+    (serve.py loads in the master before forking workers).
+    """
+    global df , indices_obj , tfidf_matrix , TITLE_TO_IDX , TMDB_TO_IDX , TITLES , TMDB_IDS , ARTIFACT_VERSION
+
+    with _ARTIFACT_LOCK:
+        if artifacts_ready():
+            return
+        ARTIFACT_STATE.update(
+            status="loading", stage=None, loaded=[], timings={},
+            started_at=time.time(), ready_at=None, error=None,
+        )
+        try:
+            with _artifact_stage("manifest"):
+                manifest = read_manifest()
+
+            with _artifact_stage("df"):
+                frame = _load_pickle(DF_PATH)
+            if frame is None or "title" not in frame.columns:
+                raise RuntimeError("Dataframe not loaded properly or missing 'title' column")
+
+            with _artifact_stage("indices"):
+                indices = _load_pickle(INDICES_PATH)
+
+            with _artifact_stage("tfidf_matrix"):
+                matrix = _load_pickle(TFIDF_MATRIX_PATH)
+
+            if manifest is not None:
+                rows = int(manifest["rows"])
+                if len(frame) != rows or matrix.shape[0] != rows:
+                    raise RuntimeError(
+                        f"artifact row counts ({len(frame)} df , {matrix.shape[0]} matrix) "
+                        f"do not match manifest.json ({rows})"
+                    )
+
+            with _artifact_stage("lookup_maps"):
+                title_map = build_title_to_idx_map(indices)
+                tmdb_map = build_tmdb_to_idx_map(frame)
+                titles , tmdb_ids = build_row_arrays(frame)
+                if manifest is not None:
+                    version = str(manifest["version"])
+                else:
+                    version = artifact_version([DF_PATH, INDICES_PATH, TFIDF_MATRIX_PATH, TFIDF_PATH])
+        except Exception as e:
+            ARTIFACT_STATE.update(status="failed", error=f"{type(e).__name__}: {e}")
+            raise
+
+        df , indices_obj , tfidf_matrix = frame , indices , matrix
+        TITLE_TO_IDX , TMDB_TO_IDX , ARTIFACT_VERSION = title_map , tmdb_map , version
+        TITLES , TMDB_IDS = titles , tmdb_ids
+        GENRE_INDEX.add_local(frame)
+        ARTIFACT_STATE.update(status="ready", stage=None, ready_at=time.time())
+
+
+@on_startup
+async def start_artifact_loading():
+    global _artifact_task
+    if artifacts_ready():
+        return
+    if not LAZY_ARTIFACTS:
+        await asyncio.to_thread(load_pickles)
+        return
+    _artifact_task = asyncio.create_task(asyncio.to_thread(load_pickles))
+    # the failure is recorded in ARTIFACT_STATE , don't warn about an unretrieved exception
+    _artifact_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+@on_shutdown
+async def close_http_client():
+    if _http_client is not None:
+        await _http_client.aclose()
 
-    TITLE_TO_IDX = build_title_to_idx_map(indices_obj)
 
-    if df is None or "title" not in df.columns:
-        raise RuntimeError("Dataframe not loaded properly or missing 'title' column")
-    
 @app.get("/health")
 def health():
+    return {"status":"ok", "artifacts": ARTIFACT_STATE["status"]}
+
+
+@app.get("/health/live")
+def health_live():
+    """liveness: the process is up and the event loop answers , artifacts or not"""
     return {"status":"ok"}
 
+
+@app.get("/health/ready")
+def health_ready():
+    """readiness: 200 once the artifacts are loaded , 503 with load progress until then"""
+    snapshot = artifact_snapshot()
+    if not artifacts_ready():
+        headers = {"Retry-After": str(ARTIFACT_RETRY_AFTER)} if snapshot["status"] != "failed" else None
+        return JSONResponse(status_code=503, content=snapshot, headers=headers)
+    return snapshot
+
+
+SMAPS_FIELDS = {
+    "Rss": "rss", "Pss": "pss", "Shared_Clean": "shared_clean", "Shared_Dirty": "shared_dirty",
+    "Private_Clean": "private_clean", "Private_Dirty": "private_dirty", "Swap": "swap",
+}
+
+
+def process_memory(pid: Any = "self") -> Optional[Dict[str, float]]:
+    """
+    MB from /proc/<pid>/smaps_rollup (linux only). shared = pages still shared with other
+    processes (e.g. the serve.py master's artifacts) , private = pages this process owns
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    kb : Dict[str, int] = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in SMAPS_FIELDS:
+            kb[SMAPS_FIELDS[parts[0].rstrip(":")]] = int(parts[1])
+    kb["shared"] = kb.get("shared_clean", 0) + kb.get("shared_dirty", 0)
+    kb["private"] = kb.get("private_clean", 0) + kb.get("private_dirty", 0)
+    return {k: round(v / 1024, 1) for k, v in kb.items()}
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    process-local counters (each uvicorn worker reports its own)
+    """
+    requests_total = TMDB_METRICS["requests"] or 1
+    return {
+        "tmdb": {
+            **dict(TMDB_METRICS),
+            "hedge_rate": round(TMDB_METRICS["hedges"] / requests_total, 4),
+            "retry_rate": round(TMDB_METRICS["retries"] / requests_total, 4),
+            "latency_p95": {
+                route: round(p95, 4)
+                for route in list(_TMDB_LATENCIES)
+                if (p95 := _latency_p95(route)) is not None
+            },
+        },
+        "rate_limiter": TMDB_LIMITER.snapshot(),
+        "circuit_breaker": TMDB_BREAKER.snapshot(),
+        "disk_cache": TMDB_DISK_CACHE.snapshot() if TMDB_DISK_CACHE is not None else None,
+        "cache_warmer": WARM_STATUS,
+        "shared_cache": SHARED_CACHE.snapshot(),
+        "artifacts": artifact_snapshot(),
+        "genre_index": GENRE_INDEX.snapshot(),
+        "memory": {"pid": os.getpid(), **(process_memory() or {})},
+        "route_budgets": ROUTE_BUDGETS,
+    }
+
 @app.get("/home", response_model=List[TMDBMovieCard])
 async def home(
     category: str = Query("popular"),
     limit: int = Query(24, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="comma separated card fields to keep"),
+    img_size: str = Query("w500", description="poster size for poster_url (w92 .. w780, original)"),
 ):
     """
     Home feed for Streamlit (posters).
@@ -342,15 +2248,15 @@ async def home(
       - popular, top_rated, upcoming, now_playing  (movie/{category})
     """
     try:
-        if category == "trending":
-            data = await tmdb_get("/trending/movie/day", {"language": "en-US"})
-            return await tmdb_cards_from_results(data.get("results", []), limit=limit)
-
-        if category not in {"popular", "top_rated", "upcoming", "now_playing"}:
+        if category not in HOME_CATEGORIES:
             raise HTTPException(status_code=400, detail="Invalid category")
 
-        data = await tmdb_get(f"/movie/{category}", {"language": "en-US", "page": 1})
-        return await tmdb_cards_from_results(data.get("results", []), limit=limit)
+        path, params = home_feed_request(category)
+        data = await tmdb_get(path, params)
+        cards = card_dicts_from_results(
+            data.get("results", []), limit=limit, img_size=poster_size_param(img_size)
+        )
+        return fast_json(project(cards, parse_fields(fields)))
 
     except HTTPException:
         raise
@@ -358,25 +2264,99 @@ async def home(
         raise HTTPException(status_code=500, detail=f"Home route failed: {e}")
 
 
+@app.get("/home/all")
+async def home_all(
+    limit: int = Query(24, ge=1, le=50, description="cards per category"),
+    fields: Optional[str] = Query(None, description="comma separated card fields to keep"),
+    img_size: str = Query("w500", description="poster size for poster_url (w92 .. w780, original)"),
+):
+    """
+    every home category in one call , fetched concurrently:
+      {"categories": {"trending": [...], ...}, "errors": {"upcoming": {...}}, "partial": ["popular"]}
+    a failing category lands in "errors" , one that misses the route budget in "partial" ,
+    instead of failing the whole feed.
+    """
+    img_size = poster_size_param(img_size)
+    keep = parse_fields(fields)
+
+    async def feed(category: str) -> List[Dict[str, Any]]:
+        path, params = home_feed_request(category)
+        data = await tmdb_get(path, params)
+        cards = card_dicts_from_results(data.get("results", []), limit=limit, img_size=img_size)
+        return project(cards, keep)
+
+    results = await asyncio.gather(
+        *(run_section(c, feed(c)) for c in HOME_CATEGORIES), return_exceptions=True
+    )
+
+    categories : Dict[str, Any] = {}
+    errors : Dict[str, Any] = {}
+    for category, res in zip(HOME_CATEGORIES, results):
+        if res is None:
+            # missed the budget , listed in "partial"
+            continue
+        if isinstance(res, HTTPException):
+            errors[category] = {"status": res.status_code, "detail": res.detail}
+        elif isinstance(res, BaseException):
+            errors[category] = {"status": 500, "detail": f"Home route failed: {res}"}
+        else:
+            categories[category] = res
+
+    partial = partial_sections()
+    if not categories:
+        status = 504 if partial and not errors else 502
+        return fast_json({"categories": {}, "errors": errors, "partial": partial}, status_code=status)
+    return fast_json({"categories": categories, "errors": errors, "partial": partial})
+
+
 # ---------- TMDB KEYWORD SEARCH (MULTIPLE RESULTS) ----------
 @app.get("/tmdb/search")
 async def tmdb_search(
     query: str = Query(..., min_length=1),
     page: int = Query(1, ge=1, le=10),
+    fields: Optional[str] = Query(None, description="comma separated raw TMDB result fields to keep, e.g. id,title,poster_path"),
+    pages: Optional[str] = Query(None, max_length=64, description="aggregate several pages, e.g. 1-5 or 1,2,4"),
+    max_results: Optional[int] = Query(None, ge=1, le=SEARCH_MAX_PAGES * 20, description="aggregate enough pages for this many results"),
+    sort: str = Query("relevance", description="aggregated mode: relevance | popularity | local"),
+    img_size: str = Query("w500", description="aggregated mode poster size"),
 ):
     """
     Returns RAW TMDB shape with 'results' list.
     Streamlit will use it for:
       - dropdown suggestions
       - grid results
+
+    with `pages` or `max_results` the pages are fetched concurrently and merged into
+    de-duplicated compact cards instead (see aggregate_search).
     """
-    return await tmdb_search_movie(query=query, page=page)
+    if pages is not None or max_results is not None:
+        page_list = parse_pages(pages) if pages else list(range(1, math.ceil(max_results / 20) + 1))
+        if sort not in SEARCH_SORTS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of {sorted(SEARCH_SORTS)}")
+        result = await aggregate_search(query, page_list, max_results, sort, poster_size_param(img_size))
+        result["results"] = project(result["results"], parse_fields(fields))
+        return fast_json(result)
+
+    data = await tmdb_search_movie(query=query, page=page)
+    keep = parse_fields(fields)
+    if keep:
+        data = {**data, "results": project(data.get("results", []), keep)}
+    return fast_json(data)
 
 
 # ---------- MOVIE DETAILS (SAFE ROUTE) ----------
 @app.get("/movie/id/{tmdb_id}", response_model=TMDBMovieDetails)
-async def movie_details_route(tmdb_id: int):
-    return await tmdb_movie_details(tmdb_id)
+async def movie_details_route(
+    tmdb_id: int,
+    img_size: str = Query("w500", description="poster size"),
+    backdrop_size: str = Query("w500", description="backdrop size (w300, w780, w1280, original)"),
+):
+    if backdrop_size not in BACKDROP_SIZES:
+        raise HTTPException(status_code=400, detail=f"backdrop_size must be one of {list(BACKDROP_SIZES)}")
+    details = await tmdb_movie_details(tmdb_id, poster_size_param(img_size), backdrop_size)
+    # only ids tmdb knows count , unknown ids would just pad the counter
+    record_movie_hit(tmdb_id)
+    return details
 
 
 # ---------- GENRE RECOMMENDATIONS ----------
@@ -384,39 +2364,889 @@ async def movie_details_route(tmdb_id: int):
 async def recommend_genre(
     tmdb_id: int = Query(...),
     limit: int = Query(18, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="comma separated card fields to keep"),
+    img_size: str = Query("w500", description="poster size for poster_url (w92 .. w780, original)"),
 ):
     """
     Given a TMDB movie ID:
-    - fetch details
-    - pick first genre
-    - discover movies in that genre (popular)
+    - look up its genres in the local genre index (details call only for unknown movies)
+    - blend the popular movies of all those genres
     """
-    details = await tmdb_movie_details(tmdb_id)
-    if not details.genres:
-        return []
-
-    genre_id = details.genres[0]["id"]
-    discover = await tmdb_get(
-        "/discover/movie",
-        {
-            "with_genres": genre_id,
-            "language": "en-US",
-            "sort_by": "popularity.desc",
-            "page": 1,
-        },
-    )
-    cards = await tmdb_cards_from_results(discover.get("results", []), limit=limit)
-    return [c for c in cards if c.tmdb_id != tmdb_id]
+    cards = await genre_recommendation_cards(tmdb_id, limit, poster_size_param(img_size))
+    return fast_json(project(cards, parse_fields(fields)))
 
 
 # ---------- TF-IDF ONLY (debug/useful) ----------
 @app.get("/recommend/tfidf")
 async def recommend_tfidf(
-    title: str = Query(..., min_length=1),
+    title: Optional[str] = Query(None, min_length=1),
     top_n: int = Query(10, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="opaque cursor from a previous page"),
+    page_size: Optional[int] = Query(None, ge=1, le=100),
+):
+    """
+    without cursor / page_size: plain list of the top_n matches.
+    with them: {"items": [...], "next_cursor": ...} pages over the cached ranking
+    (first page needs `title` , later pages only the cursor).
+    """
+    if cursor is None and page_size is None:
+        if not title:
+            raise HTTPException(status_code=422, detail="title is required")
+        recs = await tfidf_recommend_titles(title, top_k=top_n)
+        response = fast_json([{"title": t, "score": s} for t, s in recs])
+    else:
+        # the cursor carries the model version , so it can't be checked mid-load either
+        require_artifacts()
+        size = page_size or top_n
+        if cursor is not None:
+            idx, offset = decode_cursor(cursor)
+        elif title:
+            idx, offset = get_local_idx_by_title(title), 0
+        else:
+            raise HTTPException(status_code=422, detail="title or cursor is required")
+
+        recs = await tfidf_page(idx, offset, size)
+        depth = len((await tfidf_ranking(idx))[0])
+        next_offset = offset + size
+        response = fast_json({
+            "items": [{"rank": offset + i, "title": t, "score": s} for i, (t, s) in enumerate(recs)],
+            "next_cursor": encode_cursor(idx, next_offset) if next_offset < depth else None,
+            "model_version": ARTIFACT_VERSION,
+        })
+
+    response.headers[MODEL_VERSION_HEADER] = ARTIFACT_VERSION or ""
+    return response
+
+
+"""
+personalized feed: one profile vector per user instead of one ranking per liked title.
+liked rows of tfidf_matrix are weighted (explicit weight x rating/5 x recency decay) and
+summed , the profile is l2 normalized and scored against the corpus with a single sparse
+product. seen items are masked out with a boolean bitmap before top-k selection.
+"""
+def resolve_liked_rows(req: ProfileRequest) -> Tuple[List[int], List[float], List[Any]]:
+    now = time.time()
+    rows : List[int] = []
+    weights : List[float] = []
+    unresolved : List[Any] = []
+
+    for item in req.liked:
+        idx = None
+        if item.tmdb_id is not None and TMDB_TO_IDX is not None:
+            idx = TMDB_TO_IDX.get(int(item.tmdb_id))
+        if idx is None and item.title and TITLE_TO_IDX is not None:
+            idx = TITLE_TO_IDX.get(_norm_title(item.title))
+        if idx is None:
+            unresolved.append(item.title if item.title else item.tmdb_id)
+            continue
+
+        w = item.weight
+        if item.rating is not None:
+            w *= item.rating / 5.0
+        if req.half_life_days and item.watched_at:
+            age_days = max(0.0, now - item.watched_at) / 86400.0
+            w *= 0.5 ** (age_days / req.half_life_days)
+        rows.append(int(idx))
+        weights.append(w)
+    return rows, weights, unresolved
+
+
+def profile_recommend(req: ProfileRequest) -> Dict[str, Any]:
+    require_artifacts()
+
+    rows, weights, unresolved = resolve_liked_rows(req)
+    if not rows:
+        raise HTTPException(status_code=404, detail="None of the liked titles are in the local dataset")
+
+    w = np.asarray(weights, dtype=np.float64)
+    if not np.any(w > 0):
+        raise HTTPException(status_code=400, detail="All liked items have zero weight")
+
+    # (k x V)^T @ (k,) -> dense profile over the vocabulary
+    profile = np.asarray(tfidf_matrix[rows].T @ w).ravel()
+    norm = np.linalg.norm(profile)
+    if norm == 0:
+        raise HTTPException(status_code=404, detail="Liked titles have no usable text features")
+    profile /= norm
+
+    scores = np.asarray(tfidf_matrix @ profile).ravel()
+
+    seen = np.zeros(scores.shape[0], dtype=bool)
+    seen[rows] = True
+    for t in req.exclude_titles:
+        i = TITLE_TO_IDX.get(_norm_title(t)) if TITLE_TO_IDX is not None else None
+        if i is not None:
+            seen[int(i)] = True
+    for tid in req.exclude_tmdb_ids:
+        i = TMDB_TO_IDX.get(int(tid)) if TMDB_TO_IDX is not None else None
+        if i is not None:
+            seen[int(i)] = True
+    scores[seen] = -np.inf
+
+    k = min(req.top_n, int((~seen).sum()))
+    if k <= 0:
+        top = np.empty(0, dtype=np.int64)
+    else:
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+    items = []
+    for i in top.tolist():
+        item : Dict[str, Any] = {"title": str(TITLES[i]), "score": float(scores[i])}
+        if TMDB_IDS is not None:
+            tid = int(TMDB_IDS[i])
+            item["tmdb_id"] = tid if tid >= 0 else None
+        items.append(item)
+
+    return {
+        "items": items,
+        "resolved": len(rows),
+        "unresolved": unresolved,
+        "model_version": ARTIFACT_VERSION,
+    }
+
+
+# ---------- PERSONALIZED PROFILE FEED ----------
+@app.post("/recommend/profile")
+async def recommend_profile(req: ProfileRequest):
+    return fast_json(profile_recommend(req))
+
+
+"""
+streaming recommendations: the tfidf ranking goes out immediately , then one event per
+poster card and the genre block as each upstream call completes.
+ndjson -> one json object per line , sse -> `event: <type>` + `data: <json>`
+event types: tfidf , card , genre , error , done
+"""
+STREAM_ENRICH_CONCURRENCY = int(os.getenv("STREAM_ENRICH_CONCURRENCY", "6"))
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def _stream_event(fmt: str, event: Dict[str, Any]) -> bytes:
+    data = json_dumps(event)
+    if fmt == "sse":
+        return b"event: " + event["type"].encode() + b"\ndata: " + data + b"\n\n"
+    return data + b"\n"
+
+
+async def recommendation_events(
+        title: Optional[str], tmdb_id: Optional[int], top_n: int, genre_limit: int, img_size: str
+):
+    sem = asyncio.Semaphore(STREAM_ENRICH_CONCURRENCY)
+
+    async def enrich(rank: int, rec_title: str) -> Dict[str, Any]:
+        async with sem:
+            card = await attach_tmdb_card_by_title(rec_title, img_size)
+        return {
+            "type": "card",
+            "rank": rank,
+            "title": rec_title,
+            "tmdb": card.model_dump() if card is not None else None,
+        }
+
+    async def genre() -> Dict[str, Any]:
+        try:
+            items = await genre_recommendation_cards(tmdb_id, genre_limit, img_size)
+        except HTTPException as e:
+            return {"type": "error", "section": "genre", "status": e.status_code, "detail": e.detail}
+        return {"type": "genre", "items": items}
+
+    tasks : List[asyncio.Task] = []
+    if tmdb_id is not None:
+        # start the slow upstream work before the cpu bound ranking
+        tasks.append(asyncio.ensure_future(genre()))
+
+    if title:
+        try:
+            recs = await tfidf_recommend_titles(title, top_k=top_n)
+        except HTTPException as e:
+            recs = []
+            yield {"type": "error", "section": "tfidf", "status": e.status_code, "detail": e.detail}
+        yield {"type": "tfidf", "items": [{"rank": i, "title": t, "score": sc} for i, (t, sc) in enumerate(recs)]}
+        tasks.extend(asyncio.ensure_future(enrich(i, t)) for i, (t, _) in enumerate(recs))
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+    yield {"type": "done"}
+
+
+# ---------- STREAMING RECOMMENDATIONS ----------
+@app.get("/recommend/stream")
+async def recommend_stream(
+    title: Optional[str] = Query(None, min_length=1, description="local title for tf-idf recommendations"),
+    tmdb_id: Optional[int] = Query(None, description="tmdb id for the genre block"),
+    top_n: int = Query(10, ge=1, le=50),
+    genre_limit: int = Query(18, ge=1, le=50),
+    img_size: str = Query("w500"),
+    fmt: str = Query("ndjson", alias="format"),
+):
+    if fmt not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+    if not title and tmdb_id is None:
+        raise HTTPException(status_code=400, detail="title and/or tmdb_id is required")
+    img_size = poster_size_param(img_size)
+
+    async def body():
+        async for event in recommendation_events(title, tmdb_id, top_n, genre_limit, img_size):
+            yield _stream_event(fmt, event)
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+"""
+background cache warmer.
+at startup and every WARM_INTERVAL seconds: all home categories , details of the top
+WARM_TOP_IDS most requested (topped up with popular) tmdb ids , genre discovery pages and
+tfidf results for the WARM_TOP_TITLES most popular local titles.
+runs in the background lane (live traffic always wins the rate limiter) with at most
+WARM_CONCURRENCY upstream calls in flight.
+"""
+WARM_ENABLED = os.getenv("WARM_ENABLED", "1") == "1"
+WARM_INTERVAL = float(os.getenv("WARM_INTERVAL", "300"))
+WARM_START_DELAY = float(os.getenv("WARM_START_DELAY", "2"))
+WARM_CONCURRENCY = max(1, min(8, int(os.getenv("WARM_CONCURRENCY", "3"))))
+WARM_TOP_IDS = int(os.getenv("WARM_TOP_IDS", "50"))
+WARM_TOP_TITLES = int(os.getenv("WARM_TOP_TITLES", "100"))
+
+MOVIE_ID_HITS : Counter = Counter()
+MOVIE_ID_HITS_KEEP = max(WARM_TOP_IDS * 20, 1000)
+WARM_STATUS : Dict[str, Any] = {"runs": 0, "last_started_at": None, "last_duration": None, "last_errors": 0}
+
+
+def record_movie_hit(tmdb_id: int) -> None:
+    """counts a details lookup for the warmer ; trimmed to the hottest MOVIE_ID_HITS_KEEP ids"""
+    MOVIE_ID_HITS[tmdb_id] += 1
+    if len(MOVIE_ID_HITS) > 2 * MOVIE_ID_HITS_KEEP:
+        hottest = MOVIE_ID_HITS.most_common(MOVIE_ID_HITS_KEEP)
+        MOVIE_ID_HITS.clear()
+        MOVIE_ID_HITS.update(dict(hottest))
+
+
+_warm_task : Optional[asyncio.Task] = None
+
+
+def _popular_local_titles(n: int) -> List[str]:
+    if df is None or n <= 0:
+        return []
+    for col in ("popularity", "vote_count"):
+        if col in df.columns:
+            ranked = pd.to_numeric(df[col], errors="coerce").fillna(0).nlargest(n)
+            return [str(t) for t in df.loc[ranked.index, "title"]]
+    return [str(t) for t in df["title"].head(n)]
+
+
+async def warm_caches() -> None:
+    sem = asyncio.Semaphore(WARM_CONCURRENCY)
+    errors = 0
+
+    async def run(coro_fn, *args) -> Any:
+        nonlocal errors
+        async with sem:
+            try:
+                return await coro_fn(*args)
+            except Exception:
+                errors += 1
+                return None
+
+    with tmdb_lane(LANE_BACKGROUND):
+        feeds = await asyncio.gather(
+            *(run(tmdb_get, *home_feed_request(c)) for c in HOME_CATEGORIES)
+        )
+
+        top_ids = [tmdb_id for tmdb_id, _ in MOVIE_ID_HITS.most_common(WARM_TOP_IDS)]
+        for feed in feeds:
+            for res in (feed or {}).get("results", []):
+                if len(top_ids) >= WARM_TOP_IDS:
+                    break
+                if res.get("id") and int(res["id"]) not in top_ids:
+                    top_ids.append(int(res["id"]))
+        await asyncio.gather(*(run(tmdb_movie_details, i) for i in top_ids))
+        # genre discover pages are kept by the genre index refresh
+
+    # cpu work: one ranking at a time , yielding to the event loop in between
+    # (skipped until the artifacts are loaded , the next run picks it up)
+    for title in _popular_local_titles(WARM_TOP_TITLES) if artifacts_ready() else []:
+        try:
+            await tfidf_recommend_titles(title)
+        except HTTPException:
+            pass
+        await asyncio.sleep(0.005)
+
+    WARM_STATUS["last_errors"] = errors
+
+
+async def _warm_loop() -> None:
+    await asyncio.sleep(WARM_START_DELAY)
+    while True:
+        started = time.monotonic()
+        WARM_STATUS["last_started_at"] = time.time()
+        try:
+            await warm_caches()
+        except Exception:
+            WARM_STATUS["last_errors"] = WARM_STATUS.get("last_errors", 0) + 1
+        WARM_STATUS["runs"] += 1
+        WARM_STATUS["last_duration"] = round(time.monotonic() - started, 3)
+        await asyncio.sleep(WARM_INTERVAL)
+
+
+@on_startup
+async def start_cache_warmer():
+    global _warm_task
+    if WARM_ENABLED and api:
+        _warm_task = asyncio.create_task(_warm_loop())
+
+
+@on_shutdown
+async def stop_cache_warmer():
+    if _warm_task is not None:
+        _warm_task.cancel()
+
+
+"""
+http caching for edge caches / reverse proxies.
+buffered json GET responses get a strong ETag (content hash , plus the model version for tfidf
+results) with 304 on If-None-Match , a per-route Cache-Control , and gzip/brotli compression
+above COMPRESS_MIN_BYTES. compressed variants carry their own ETag suffix (-gz / -br).
+"""
+try:
+    import brotli
+except ImportError:  # optional , gzip only
+    brotli = None
+
+MODEL_VERSION_HEADER = "X-Model-Version"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+HTTP_CACHE_SKIP_PREFIXES = ("/admin", "/metrics", "/health", "/docs", "/openapi.json", "/redoc")
+
+
+def cache_max_age(request: Request) -> int:
+    path = request.url.path
+    if path.startswith("/recommend/tfidf"):
+        # only changes with a model rebuild , the ETag carries the version
+        return 24 * 3600
+    if path.startswith("/movie/id/"):
+        return 3600
+    if path.startswith("/recommend/genre"):
+        return 1800
+    if path == "/home/all" or (path == "/home" and request.query_params.get("category") == "trending"):
+        # trending moves fastest
+        return 300
+    if path.startswith("/home"):
+        return 900
+    if path.startswith("/tmdb/search"):
+        return 600
+    return 60
+
+
+def _accepted_encoding(request: Request) -> Optional[str]:
+    accept = request.headers.get("accept-encoding", "")
+    offered = {part.split(";")[0].strip().lower() for part in accept.split(",")}
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def _etag_matches(if_none_match: Optional[str], etags: List[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {t.strip() for t in if_none_match.split(",")}
+    return "*" in candidates or any(e in candidates or f"W/{e}" in candidates for e in etags)
+
+
+@app.middleware("http")
+async def http_cache_middleware(request: Request, call_next):
+    response = await call_next(request)
+
+    if (
+        request.method not in ("GET", "HEAD")
+        or response.status_code != 200
+        or request.url.path.startswith(HTTP_CACHE_SKIP_PREFIXES)
+        or not response.headers.get("content-type", "").startswith("application/json")
+    ):
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = dict(response.headers)
+    headers.pop("content-length", None)
+
+    h = hashlib.blake2b(body, digest_size=16)
+    h.update(headers.get(MODEL_VERSION_HEADER.lower(), "").encode())
+    base = h.hexdigest()
+    encoding = _accepted_encoding(request) if len(body) >= COMPRESS_MIN_BYTES else None
+    suffix = {"gzip": "-gz", "br": "-br"}.get(encoding or "", "")
+    etag = f'"{base}{suffix}"'
+
+    # stale or partial answers must not be pinned by edge caches
+    degraded = headers.get("x-tmdb-stale") == "1" or PARTIAL_HEADER.lower() in headers
+    headers["etag"] = etag
+    headers["cache-control"] = "no-cache" if degraded else f"public, max-age={cache_max_age(request)}"
+    # CORSMiddleware may already vary on Origin , keep it
+    vary = [v.strip() for v in headers.get("vary", "").split(",") if v.strip()]
+    if "accept-encoding" not in {v.lower() for v in vary}:
+        vary.append("Accept-Encoding")
+    headers["vary"] = ", ".join(vary)
+
+    if _etag_matches(request.headers.get("if-none-match"), [f'"{base}"', f'"{base}-gz"', f'"{base}-br"']):
+        return Response(status_code=304, headers=headers)
+
+    if encoding == "br":
+        body = brotli.compress(body, quality=4)
+        headers["content-encoding"] = "br"
+    elif encoding == "gzip":
+        body = gzip.compress(body, compresslevel=5)
+        headers["content-encoding"] = "gzip"
+
+    return Response(body, status_code=200, headers=headers, media_type=None)
+
+
+"""
+local image proxy: /img/{size}/{file} serves tmdb images through a bounded disk cache
+(IMG_CACHE_DIR , IMG_CACHE_MAX_MB , oldest-first eviction) with long-lived cache headers.
+IMG_UPSTREAM_BASE points at image.tmdb.org by default and can be any local stand-in.
+set IMG_PROXY_BASE so make_img_url hands out proxy urls.
+"""
+IMG_UPSTREAM_BASE = os.getenv("IMG_UPSTREAM_BASE", TMDB_IMG_BASE).rstrip("/")
+IMG_CACHE_DIR = os.getenv("IMG_CACHE_DIR", os.path.join(BASE_DIR, "cache", "img"))
+IMG_CACHE_MAX_MB = float(os.getenv("IMG_CACHE_MAX_MB", "512"))
+IMG_MAX_AGE = 30 * 24 * 3600
+IMG_FILE_RE = re.compile(r"[A-Za-z0-9_-]+\.(jpg|jpeg|png|webp|svg)")
+IMG_MEDIA_TYPES = {
+    "jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png",
+    "webp": "image/webp", "svg": "image/svg+xml",
+}
+
+
+class ImageDiskCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total : Optional[int] = None
+        self._lock = threading.Lock()
+
+    def path_for(self, size: str, name: str) -> str:
+        return os.path.join(self.root, size, name)
+
+    def read(self, size: str, name: str) -> Optional[bytes]:
+        try:
+            with open(self.path_for(size, name), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _scan(self) -> List[Tuple[float, int, str]]:
+        files = []
+        for dirpath, _, names in os.walk(self.root):
+            for n in names:
+                full = os.path.join(dirpath, n)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, full))
+        return files
+
+    def write(self, size: str, name: str, data: bytes) -> None:
+        target = self.path_for(size, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # atomic publish , other workers never see a half written file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+        with self._lock:
+            if self.total is None:
+                self.total = sum(size_ for _, size_, _ in self._scan())
+            else:
+                self.total += len(data)
+            if self.total > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        files = sorted(self._scan())
+        total = sum(size_ for _, size_, _ in files)
+        target = int(self.max_bytes * 0.9)
+        for _, size_, full in files:
+            if total <= target:
+                break
+            try:
+                os.remove(full)
+                total -= size_
+            except OSError:
+                pass
+        self.total = total
+
+
+IMG_CACHE = ImageDiskCache(IMG_CACHE_DIR, int(IMG_CACHE_MAX_MB * 1024 * 1024))
+_IMG_INFLIGHT : Dict[str, "asyncio.Future[bytes]"] = {}
+
+
+async def _fetch_image(size: str, name: str) -> bytes:
+    """single flight per image: concurrent misses share one upstream download"""
+    key = f"{size}/{name}"
+    pending = _IMG_INFLIGHT.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+
+    fut : "asyncio.Future[bytes]" = asyncio.get_running_loop().create_future()
+    _IMG_INFLIGHT[key] = fut
+    try:
+        try:
+            r = await get_http_client().get(f"{IMG_UPSTREAM_BASE}/{key}", timeout=TMDB_ATTEMPT_TIMEOUT)
+        except httpx.RequestError as e:
+            raise HTTPException(status_code=502, detail=f"Image upstream error: {type(e).__name__}")
+        if r.status_code == 404:
+            raise HTTPException(status_code=404, detail="Image not found")
+        if r.status_code != 200:
+            raise HTTPException(status_code=502, detail=f"Image upstream error: {r.status_code}")
+        data = r.content
+        await asyncio.to_thread(IMG_CACHE.write, size, name, data)
+        fut.set_result(data)
+        return data
+    except BaseException as e:
+        fut.set_exception(e)
+        # nobody else may be waiting , don't warn about an unretrieved exception
+        fut.exception()
+        raise
+    finally:
+        _IMG_INFLIGHT.pop(key, None)
+
+
+# ---------- IMAGE PROXY ----------
+@app.get("/img/{size}/{name}")
+async def image_proxy(size: str, name: str, request: Request):
+    if size not in POSTER_SIZES and size not in BACKDROP_SIZES:
+        raise HTTPException(status_code=400, detail="Unsupported image size")
+    match = IMG_FILE_RE.fullmatch(name)
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid image name")
+
+    # the file name is content addressed upstream , so it makes a stable strong etag
+    etag = f'"{size}-{name}"'
+    headers = {
+        "Cache-Control": f"public, max-age={IMG_MAX_AGE}, immutable",
+        "ETag": etag,
+    }
+    if _etag_matches(request.headers.get("if-none-match"), [etag]):
+        return Response(status_code=304, headers=headers)
+
+    data = await asyncio.to_thread(IMG_CACHE.read, size, name)
+    if data is None:
+        data = await _fetch_image(size, name)
+        headers["X-Image-Cache"] = "miss"
+    else:
+        headers["X-Image-Cache"] = "hit"
+    return Response(data, media_type=IMG_MEDIA_TYPES[match.group(1)], headers=headers)
+
+
+"""
+on-demand profiling of live requests (admin only)
+arm a route with POST /admin/profile for the next N requests or T seconds,
+or send the admin token in the X-Profile header to profile a single request.
+cprofile mode -> pstats download , sample mode -> collapsed stacks (flamegraph.pl / speedscope)
+"""
+PROFILE_HEADER = "X-Profile"
+PROFILE_MODES = {"cprofile", "sample"}
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+
+class ProfileSession:
+    def __init__(
+            self, route: Optional[str], mode: str,
+            max_requests: Optional[int], seconds: Optional[float]
+    ):
+        self.route = route
+        self.mode = mode
+        self.remaining = max_requests
+        self.expires_at = time.monotonic() + seconds if seconds else None
+        self.started_at = time.time()
+        self.profiled = 0
+        self.stats : Optional[pstats.Stats] = None
+        self.stacks : Counter = Counter()
+
+    def active(self) -> bool:
+        if self.remaining is not None and self.remaining <= 0:
+            return False
+        if self.expires_at is not None and time.monotonic() > self.expires_at:
+            return False
+        return True
+
+    def claim(self, path: str) -> bool:
+        """reserve one profiled request for this path (counted up front so concurrent requests don't overshoot)"""
+        if not self.active() or (self.route is not None and path != self.route):
+            return False
+        if self.remaining is not None:
+            self.remaining -= 1
+        return True
+
+    def add_profile(self, prof: cProfile.Profile) -> None:
+        if self.stats is None:
+            self.stats = pstats.Stats(prof)
+        else:
+            self.stats.add(prof)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "route": self.route,
+            "mode": self.mode,
+            "active": self.active(),
+            "remaining_requests": self.remaining,
+            "seconds_left": (
+                max(0.0, round(self.expires_at - time.monotonic(), 1))
+                if self.expires_at is not None else None
+            ),
+            "started_at": self.started_at,
+            "profiled_requests": self.profiled,
+            "samples": sum(self.stacks.values()),
+        }
+
+
+class _StackSampler(threading.Thread):
+    """
+    statistical sampler: snapshots the stack of one thread (the event loop) every interval
+    and folds it into collapsed-stack counts
+    """
+    def __init__(self, thread_id: int, interval: float, stacks: Counter):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = stacks
+        self._stop_evt = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_evt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names : List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def stop(self) -> None:
+        self._stop_evt.set()
+        self.join()
+
+
+_PROFILE_SESSION : Optional[ProfileSession] = None
+_PROFILE_BUSY = False
+
+
+def _admin_token_ok(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(str(token), str(ADMIN_TOKEN))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=404,
+            detail="Admin endpoints are disabled: ADMIN_TOKEN is not configured on the server"
+        )
+    if not _admin_token_ok(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
+
+
+@app.middleware("http")
+async def profile_middleware(request: Request, call_next):
+    """
+    only one request is profiled at a time: cProfile/sampler see the whole event loop thread,
+    so overlapping profiled requests would be double counted
+    """
+    global _PROFILE_SESSION , _PROFILE_BUSY
+
+    if _PROFILE_BUSY:
+        return await call_next(request)
+    forced = _admin_token_ok(request.headers.get(PROFILE_HEADER))
+    session = _PROFILE_SESSION
+    claimed = session is not None and session.claim(request.url.path)
+    if not (forced or claimed):
+        return await call_next(request)
+
+    if not claimed:
+        # header-triggered request the armed session doesn't cover (none , exhausted or
+        # another route): collect into a one-off session in the requested mode
+        mode = request.headers.get(f"{PROFILE_HEADER}-Mode", "cprofile")
+        session = ProfileSession(None, mode if mode in PROFILE_MODES else "cprofile", 0, None)
+        _PROFILE_SESSION = session
+
+    _PROFILE_BUSY = True
+    try:
+        if session.mode == "sample":
+            sampler = _StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL, session.stacks)
+            sampler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                sampler.stop()
+        else:
+            prof = cProfile.Profile()
+            prof.enable()
+            try:
+                response = await call_next(request)
+            finally:
+                prof.disable()
+                session.add_profile(prof)
+        session.profiled += 1
+    finally:
+        _PROFILE_BUSY = False
+
+    response.headers["X-Profiled"] = session.mode
+    return response
+
+
+# ---------- ADMIN: PROFILING ----------
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+def start_profile(
+    route: Optional[str] = Query(None, description="exact path to profile, e.g. /recommend/tfidf (default: any)"),
+    requests: Optional[int] = Query(None, ge=1, le=10000),
+    seconds: Optional[float] = Query(None, gt=0, le=3600),
+    mode: str = Query("cprofile"),
 ):
-    recs = tfidf_recommend_titles(title, top_k=top_n)
-    return [{"title": t, "score": s} for t, s in recs]
+    """
+    arms profiling for the next `requests` requests and/or `seconds` seconds.
+    replaces (and discards) any previous session.
+    """
+    global _PROFILE_SESSION
+
+    if mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {sorted(PROFILE_MODES)}")
+    if requests is None and seconds is None:
+        requests = 10
 
+    _PROFILE_SESSION = ProfileSession(route, mode, requests, seconds)
+    return _PROFILE_SESSION.summary()
+
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+def profile_status():
+    if _PROFILE_SESSION is None:
+        return {"active": False, "profiled_requests": 0}
+    return _PROFILE_SESSION.summary()
+
+
+@app.get("/admin/profile/download", dependencies=[Depends(require_admin)])
+def download_profile(fmt: str = Query("pstats", alias="format")):
+    """
+    format:
+      - pstats    (cprofile mode) -> load with pstats.Stats / snakeviz
+      - collapsed (sample mode)   -> one `frame;frame;frame count` line per stack
+    """
+    session = _PROFILE_SESSION
+    if session is None or session.profiled == 0:
+        raise HTTPException(status_code=404, detail="No profile captured yet")
+
+    if fmt == "pstats":
+        if session.stats is None:
+            raise HTTPException(status_code=400, detail="Session was not recorded in cprofile mode")
+        with tempfile.NamedTemporaryFile(suffix=".pstats") as tmp:
+            session.stats.dump_stats(tmp.name)
+            content = tmp.read()
+        return Response(
+            content,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="profile.pstats"'},
+        )
+
+    if fmt == "collapsed":
+        if not session.stacks:
+            raise HTTPException(status_code=400, detail="Session was not recorded in sample mode")
+        body = "\n".join(f"{stack} {count}" for stack, count in session.stacks.most_common())
+        return Response(
+            body + "\n",
+            media_type="text/plain",
+            headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+        )
+
+    raise HTTPException(status_code=400, detail="format must be 'pstats' or 'collapsed'")
+
+
+@app.delete("/admin/profile", dependencies=[Depends(require_admin)])
+def stop_profile():
+    global _PROFILE_SESSION
+    _PROFILE_SESSION = None
+    return {"active": False}
+
+
+# ---------- BUNDLE: Details + TF-IDF recs + Genre recs ----------
+@app.get("/movie/search", response_model=SearchBundleResponse)
+async def search_bundle(
+    query: str = Query(..., min_length=1),
+    tfidf_top_n: int = Query(12, ge=1, le=30),
+    genre_limit: int = Query(12, ge=1, le=30),
+    img_size: str = Query("w500", description="poster size for poster_url (w92 .. w780, original)"),
+):
+    """
+    everything the detail page needs in one call: the best tmdb match for `query` , its
+    details , tf-idf recommendations (with tmdb cards) and genre recommendations.
+    only the initial search is required ; the other sections run concurrently within the
+    route budget (or X-Request-Budget-Ms) and any that miss it come back empty / without
+    cards and are listed in `partial`.
+    """
+    img_size = poster_size_param(img_size)
+    best = await tmdb_search_first(query)
+    if not best:
+        raise HTTPException(status_code=404, detail=f"No TMDB results for '{query}'")
+    tmdb_id = int(best["id"])
+    record_movie_hit(tmdb_id)
+
+    async def tfidf_section() -> List[Dict[str, Any]]:
+        recs : List[Tuple[str, float]] = []
+        # the query may not be the exact local title , tmdb's canonical title often is
+        for candidate in dict.fromkeys(t for t in (query, best.get("title")) if t):
+            try:
+                recs = await tfidf_recommend_titles(candidate, top_k=tfidf_top_n)
+                break
+            except HTTPException as e:
+                if e.status_code == 503:
+                    mark_partial("tfidf")
+                    return []
+                if e.status_code != 404:
+                    raise
+        cards = await asyncio.gather(
+            *(run_section("tfidf_cards", attach_tmdb_card_by_title(t, img_size)) for t, _ in recs)
+        )
+        left = remaining_budget()
+        if left is not None and left <= DEADLINE_SLACK and any(c is None for c in cards):
+            # attach_tmdb_card_by_title swallows the 504 of a call cut by the budget
+            mark_partial("tfidf_cards")
+        return [
+            {"title": t, "score": sc, "tmdb": card.model_dump() if card is not None else None}
+            for (t, sc), card in zip(recs, cards)
+        ]
+
+    # one details fetch , shared with the genre section when the index lacks the movie
+    details_task = asyncio.ensure_future(run_section("details", tmdb_movie_details(tmdb_id, img_size)))
+
+    async def genre_section() -> List[Dict[str, Any]]:
+        try:
+            return await genre_recommendation_cards(tmdb_id, genre_limit, img_size, details=details_task)
+        except HTTPException:
+            # no genre could be fetched , the rest of the bundle still stands (a failed details
+            # fetch still fails the bundle through details_task itself)
+            mark_partial("genre")
+            return []
+
+    details, tfidf_items, genre_items = await asyncio.gather(
+        details_task,
+        tfidf_section(),
+        genre_section(),
+    )
 
-# ---------- BUNDLE: Details + TF-IDF recs + Genre re
\ No newline at end of file
+    return fast_json({
+        "query": query,
+        "movie_details": details.model_dump() if details is not None else None,
+        "tfidf_recommendations": tfidf_items,
+        "genre_recommendations": genre_items,
+        "partial": partial_sections(),
+    })
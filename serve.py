@@ -0,0 +1,202 @@
+"""
+prefork launcher: load the artifacts once in a master process , then fork the uvicorn workers
+
+    python serve.py --workers 4 --port 8000
+    python serve.py --workers 8 --report-interval 60
+
+`uvicorn main:app --workers N` imports main in N fresh processes , so every worker pays
+load_pickles and keeps its own copy of df and the tf-idf matrix. here the master runs
+load_pickles with the collector off , then gc.freeze() moves everything it allocated to the
+permanent generation (a gc pass in a worker would otherwise write into every tracked object
+header and un-share the pages) , binds the socket and forks. workers inherit the model
+copy-on-write and their lifespan skips the load. hot paths read titles / tmdb ids from flat
+numpy buffers (main.build_row_arrays) instead of df's object columns , so serving doesn't
+incref parent-owned objects either.
+
+the master restarts workers that exit unexpectedly and logs shared vs private memory per
+worker from /proc/<pid>/smaps_rollup (the same numbers each worker reports under /metrics).
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import uvicorn
+
+import main
+
+
+RESPAWN_DELAY = 1.0
+
+
+def log(msg: str) -> None:
+    print(f"[serve {os.getpid()}] {msg}", file=sys.stderr, flush=True)
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def load_shared_state(freeze: bool) -> None:
+    gc.disable()
+    started = time.perf_counter()
+    main.load_pickles()
+    log(
+        f"artifacts {main.ARTIFACT_VERSION} loaded in {time.perf_counter() - started:.1f}s "
+        f"{main.ARTIFACT_STATE['timings']}"
+    )
+    if freeze:
+        gc.collect()
+        gc.freeze()
+        log(f"gc frozen: {gc.get_freeze_count():,} objects moved to the permanent generation")
+
+
+def run_worker(sock: socket.socket, args: argparse.Namespace) -> None:
+    # the master's handlers must not leak into the worker , uvicorn installs its own
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, signal.SIG_DFL)
+    gc.enable()
+    config = uvicorn.Config(
+        main.app,
+        log_level=args.log_level,
+        access_log=args.access_log,
+        timeout_keep_alive=args.keep_alive,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def format_memory(pid: int) -> str:
+    mem = main.process_memory(pid)
+    if mem is None:
+        return f"pid {pid}: memory unavailable"
+    return (
+        f"pid {pid}: rss {mem.get('rss', 0):8.1f} MB  pss {mem.get('pss', 0):8.1f} MB  "
+        f"shared {mem['shared']:8.1f} MB  private {mem['private']:8.1f} MB"
+    )
+
+
+class Master:
+    def __init__(self, sock: socket.socket, args: argparse.Namespace):
+        self.sock = sock
+        self.args = args
+        self.workers : Dict[int, float] = {}
+        self.stopping = False
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(self.sock, self.args)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = time.time()
+
+    def _stop(self, signum: int, frame) -> None:
+        self.stopping = True
+
+    def reap(self) -> List[int]:
+        dead = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.workers.pop(pid, None) is not None:
+                dead.append(pid)
+                if not self.stopping:
+                    log(f"worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+        return dead
+
+    def report(self) -> None:
+        lines = [f"master {format_memory(os.getpid())}"]
+        lines += [f"worker {format_memory(pid)}" for pid in sorted(self.workers)]
+        log("memory:\n  " + "\n  ".join(lines))
+
+    def shutdown(self) -> None:
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.workers):
+            log(f"worker {pid} did not stop in time , killing")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.workers.pop(pid, None)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.args.workers):
+            self.spawn()
+        log(f"{self.args.workers} worker(s) serving on {self.args.host}:{self.args.port}")
+
+        next_report = time.monotonic() + self.args.report_delay
+        while not self.stopping:
+            for _ in self.reap():
+                if not self.stopping:
+                    time.sleep(RESPAWN_DELAY)
+                    self.spawn()
+            if next_report is not None and time.monotonic() >= next_report:
+                self.report()
+                interval = self.args.report_interval
+                next_report = time.monotonic() + interval if interval > 0 else None
+            time.sleep(0.2)
+
+        log("shutting down")
+        self.shutdown()
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    p = argparse.ArgumentParser(description="Prefork server: artifacts loaded once , shared copy-on-write")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    p.add_argument("--backlog", type=int, default=2048)
+    p.add_argument("--log-level", default="info")
+    p.add_argument("--access-log", action="store_true")
+    p.add_argument("--keep-alive", type=int, default=5, help="keep-alive timeout in seconds")
+    p.add_argument("--graceful-timeout", type=float, default=30.0)
+    p.add_argument("--no-freeze", action="store_true", help="skip gc.freeze (to measure its effect)")
+    p.add_argument("--report-delay", type=float, default=10.0, help="seconds until the first memory report")
+    p.add_argument("--report-interval", type=float, default=300.0, help="0 = report once")
+    args = p.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        raise SystemExit("serve.py needs os.fork , use `uvicorn main:app --workers N` on this platform")
+    if args.workers < 1:
+        raise SystemExit("--workers must be at least 1")
+
+    # the tmdb quota is per node: workers start from an even share until their leases are up
+    main.TMDB_LIMITER.set_peers(args.workers)
+    load_shared_state(freeze=not args.no_freeze)
+    sock = bind_socket(args.host, args.port, args.backlog)
+    Master(sock, args).run()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# keep the app self contained: no shared cache , no tmdb disk cache , images in a scratch dir
+os.environ.setdefault("SHARED_CACHE_URL", "none")
+os.environ.setdefault("TMDB_CACHE_ENABLED", "0")
+os.environ.setdefault("IMG_CACHE_DIR", tempfile.mkdtemp(prefix="img-cache-"))
@@ -0,0 +1,52 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+import build_artifacts
+
+
+@pytest.fixture
+def chunks(tmp_path):
+    rng = random.Random(7)
+    words = [f"term{i}" for i in range(200)] + ["the", "and", "of"]
+    docs = [" ".join(rng.choices(words, k=rng.randint(0, 25))) for _ in range(900)]
+    docs[3] = "the and of"  # only stop words
+    paths = []
+    for n, start in enumerate(range(0, len(docs), 250)):
+        path = tmp_path / f"chunk-{n}.pkl"
+        pd.DataFrame({"soup": docs[start:start + 250]}).to_pickle(path)
+        paths.append(str(path))
+    return docs, paths
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("min_df", [1, 30])
+def test_chunked_fit_matches_a_whole_corpus_fit(chunks, jobs, min_df):
+    docs, paths = chunks
+    reference = TfidfVectorizer(stop_words="english", min_df=min_df, dtype=np.float32)
+    expected = reference.fit_transform(docs)
+
+    model, matrix = build_artifacts.build_tfidf(paths, jobs, None, min_df)
+
+    assert model[0].vocabulary == list(reference.get_feature_names_out())
+    np.testing.assert_allclose(model[-1].idf_, reference.idf_, rtol=1e-6)
+    assert matrix.shape == expected.shape
+    assert abs(matrix - expected).max() < 1e-6
+
+
+def test_max_features_keeps_the_most_frequent_terms(chunks):
+    _, paths = chunks
+    model, matrix = build_artifacts.build_tfidf(paths, 1, 20, 1)
+    assert len(model[0].vocabulary) == matrix.shape[1] == 20
+    assert model[0].vocabulary == sorted(model[0].vocabulary)
+
+
+def test_indices_keep_the_first_row_per_title(tmp_path):
+    df = pd.DataFrame({"title": ["A", "B", "A"], "soup": ["x", "y", "z"]})
+    matrix = build_artifacts.sparse.csr_matrix(np.eye(3, dtype=np.float32))
+    build_artifacts.write_artifacts(str(tmp_path), df, matrix, None, {})
+    indices = pd.read_pickle(tmp_path / "indices.pkl")
+    assert indices.to_dict() == {"A": 0, "B": 1}
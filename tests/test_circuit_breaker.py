@@ -0,0 +1,80 @@
+import main
+
+
+def breaker(open_seconds=60.0, probes=2):
+    return main.CircuitBreaker(
+        failure_ratio=0.5, min_calls=4, window=10,
+        slow_call=1.0, open_seconds=open_seconds, half_open_probes=probes,
+    )
+
+
+def trip(b):
+    for healthy in (True, False, True, False):
+        b.record(healthy, 0.1)
+
+
+def test_opens_at_the_failure_ratio():
+    b = breaker()
+    for healthy in (True, False, True):
+        b.record(healthy, 0.1)
+    assert b.state == b.CLOSED  # below min_calls
+    b.record(False, 0.1)
+    assert b.state == b.OPEN
+    assert b.times_opened == 1
+    assert not b.allow()
+    assert 0 < b.retry_after() <= 60
+
+
+def test_slow_calls_count_as_failures():
+    b = breaker()
+    for _ in range(4):
+        b.record(True, 5.0)
+    assert b.state == b.OPEN
+
+
+def test_stays_closed_below_the_ratio():
+    b = breaker()
+    for healthy in (True, True, True, False, True, True):
+        b.record(healthy, 0.1)
+    assert b.state == b.CLOSED
+
+
+def test_half_open_probes_close_it():
+    b = breaker(open_seconds=0.0)
+    trip(b)
+    assert b.allow() and b.state == b.HALF_OPEN
+    assert b.allow()
+    assert not b.allow()  # both probe slots taken
+    b.record(True, 0.1)
+    assert b.state == b.HALF_OPEN
+    b.record(True, 0.1)
+    assert b.state == b.CLOSED
+    assert not b.outcomes
+
+
+def test_failed_probe_reopens_it():
+    b = breaker(open_seconds=0.0)
+    trip(b)
+    assert b.allow()
+    b.record(False, 0.1)
+    assert b.state == b.OPEN
+    assert b.times_opened == 2
+
+
+def test_neutral_outcome_only_frees_the_probe_slot():
+    b = breaker(open_seconds=0.0, probes=1)
+    trip(b)
+    assert b.allow()
+    assert not b.allow()
+    b.record(None, 0.1)
+    assert b.state == b.HALF_OPEN
+    assert b.probe_successes == 0
+    assert b.allow()  # the slot is free again
+
+
+def test_neutral_outcomes_are_not_counted_when_closed():
+    b = breaker()
+    for _ in range(10):
+        b.record(None, 5.0)
+    assert not b.outcomes
+    assert b.state == b.CLOSED
@@ -0,0 +1,110 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+POSTER = b"\xff\xd8\xff\xe0poster-bytes"
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """plays image.tmdb.org: /w185/poster.jpg exists , everything else is a 404"""
+
+    hits = []
+
+    def do_GET(self):
+        StandIn.hits.append(self.path)
+        if self.path == "/w185/poster.jpg":
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(POSTER)))
+            self.end_headers()
+            self.wfile.write(POSTER)
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StandIn.hits = []
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(upstream, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "IMG_UPSTREAM_BASE", upstream)
+    monkeypatch.setattr(main, "IMG_CACHE", main.ImageDiskCache(str(tmp_path), 1024 * 1024))
+    # the pooled client is bound to the loop that created it , each TestClient gets a new one
+    monkeypatch.setattr(main, "_http_client", None)
+    with TestClient(main.app) as c:
+        yield c
+
+
+def test_miss_then_hit(client):
+    r = client.get("/img/w185/poster.jpg")
+    assert r.status_code == 200
+    assert r.content == POSTER
+    assert r.headers["x-image-cache"] == "miss"
+    assert r.headers["content-type"] == "image/jpeg"
+    assert "immutable" in r.headers["cache-control"]
+
+    r = client.get("/img/w185/poster.jpg")
+    assert r.status_code == 200
+    assert r.content == POSTER
+    assert r.headers["x-image-cache"] == "hit"
+    assert StandIn.hits == ["/w185/poster.jpg"]
+
+
+def test_if_none_match_skips_the_body(client):
+    etag = client.get("/img/w185/poster.jpg").headers["etag"]
+    r = client.get("/img/w185/poster.jpg", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert len(StandIn.hits) == 1
+
+
+def test_upstream_404_is_not_cached(client):
+    for _ in range(2):
+        r = client.get("/img/w185/missing.jpg")
+        assert r.status_code == 404
+    assert StandIn.hits == ["/w185/missing.jpg", "/w185/missing.jpg"]
+    assert main.IMG_CACHE.read("w185", "missing.jpg") is None
+
+
+@pytest.mark.parametrize("path", [
+    "/img/w9999/poster.jpg",
+    "/img/w185/poster.exe",
+    "/img/w185/..%2Fposter.jpg",
+    "/img/w185/poster.jpg%0A",
+])
+def test_rejects_bad_input(client, path):
+    assert client.get(path).status_code in (400, 404)
+    assert StandIn.hits == []
+
+
+def test_eviction_drops_the_oldest_files(tmp_path):
+    cache = main.ImageDiskCache(str(tmp_path), 1000)
+    for i in range(3):
+        cache.write("w185", f"p{i}.jpg", b"x" * 300)
+        os.utime(cache.path_for("w185", f"p{i}.jpg"), (1000 + i, 1000 + i))
+
+    cache.write("w185", "p3.jpg", b"x" * 300)
+
+    assert cache.read("w185", "p0.jpg") is None
+    assert cache.read("w185", "p1.jpg") is not None
+    assert cache.read("w185", "p3.jpg") is not None
+    assert cache.total <= 900
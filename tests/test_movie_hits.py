@@ -0,0 +1,35 @@
+from collections import Counter
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def hits(monkeypatch):
+    counter = Counter()
+    monkeypatch.setattr(main, "MOVIE_ID_HITS", counter)
+    monkeypatch.setattr(main, "MOVIE_ID_HITS_KEEP", 10)
+    return counter
+
+
+def test_counter_is_trimmed_to_the_hottest_ids(hits):
+    for _ in range(5):
+        main.record_movie_hit(1)
+    for tmdb_id in range(100, 200):
+        main.record_movie_hit(tmdb_id)
+        assert len(hits) <= 20
+    assert hits[1] == 5
+
+
+def test_unknown_ids_are_not_counted(hits, monkeypatch):
+    async def not_found(path, params):
+        raise HTTPException(status_code=404, detail="TMDB API error: 404")
+
+    monkeypatch.setattr(main, "tmdb_get", not_found)
+    with TestClient(main.app) as client:
+        for tmdb_id in range(50):
+            assert client.get(f"/movie/id/{tmdb_id}").status_code == 404
+    assert not hits
@@ -0,0 +1,36 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("1-5", [1, 2, 3, 4, 5]),
+    ("1,3,4", [1, 3, 4]),
+    ("4, 1-2 ,2", [1, 2, 4]),
+    ("10", [10]),
+])
+def test_valid_specs(spec, expected):
+    assert main.parse_pages(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["0", "11", "5-3", "0-2", "1-11", "", ",", "a", "1-b", "-1"])
+def test_invalid_specs(spec):
+    with pytest.raises(HTTPException) as exc:
+        main.parse_pages(spec)
+    assert exc.value.status_code == 400
+
+
+def test_huge_range_is_rejected_before_expanding():
+    started = time.perf_counter()
+    with pytest.raises(HTTPException):
+        main.parse_pages("1-999999999999")
+    assert time.perf_counter() - started < 0.1
+
+
+def test_too_many_parts():
+    with pytest.raises(HTTPException) as exc:
+        main.parse_pages(",".join(["1"] * (main.SEARCH_MAX_PAGES + 1)))
+    assert exc.value.status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+TOKEN = "secret"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(main, "_PROFILE_SESSION", None)
+    with TestClient(main.app) as c:
+        yield c
+
+
+def forced(client, mode):
+    return client.get("/health/live", headers={"X-Profile": TOKEN, "X-Profile-Mode": mode})
+
+
+def test_header_without_session_uses_requested_mode(client):
+    assert forced(client, "sample").headers["x-profiled"] == "sample"
+    assert main._PROFILE_SESSION.mode == "sample"
+
+
+def test_header_bypasses_a_session_armed_for_another_route(client):
+    client.post("/admin/profile", params={"route": "/health/ready", "requests": 1}, headers={"X-Admin-Token": TOKEN})
+    r = forced(client, "sample")
+    assert r.headers["x-profiled"] == "sample"
+    assert main._PROFILE_SESSION.route is None
+
+
+def test_header_after_the_session_is_exhausted(client):
+    client.post("/admin/profile", params={"route": "/health/live", "requests": 1}, headers={"X-Admin-Token": TOKEN})
+    assert client.get("/health/live").headers["x-profiled"] == "cprofile"
+    assert "x-profiled" not in client.get("/health/live").headers
+    assert forced(client, "sample").headers["x-profiled"] == "sample"
+
+
+def test_armed_session_keeps_its_mode(client):
+    client.post("/admin/profile", params={"requests": 2, "mode": "cprofile"}, headers={"X-Admin-Token": TOKEN})
+    assert forced(client, "sample").headers["x-profiled"] == "cprofile"
+    assert main._PROFILE_SESSION.profiled == 1
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+def test_quota_is_split_across_peers():
+    limiter = main.TokenBucketLimiter(40, 20, 5, peers=4)
+    assert limiter.max_rate == limiter.rate == 10
+    assert limiter.burst == 5
+    assert limiter.tokens <= limiter.burst
+
+    limiter.set_peers(1)
+    assert limiter.max_rate == 40
+    assert limiter.burst == 20
+
+
+def test_resizing_keeps_the_backoff():
+    limiter = main.TokenBucketLimiter(40, 20, 5)
+    limiter.penalize(0)
+    assert limiter.rate == 20
+    limiter.set_peers(2)
+    assert limiter.max_rate == 20
+    assert limiter.rate == 10
+
+
+def test_workers_count_each_others_leases(tmp_path, monkeypatch):
+    cache = main.SharedCache(main._SQLiteKV(str(tmp_path / "shared.sqlite3"), 1024 * 1024))
+    monkeypatch.setattr(main, "SHARED_CACHE", cache)
+    limiter = main.TokenBucketLimiter(40, 20, 5)
+    monkeypatch.setattr(main, "TMDB_LIMITER", limiter)
+    monkeypatch.setattr(main, "TMDB_PEER_HEARTBEAT", 0.01)
+
+    # two other live workers on this host , one on another host
+    cache.set(f"{main.TMDB_PEER_PREFIX}1", b"1", 60)
+    cache.set(f"{main.TMDB_PEER_PREFIX}2", b"1", 60)
+    cache.set("mr:tmdb_peer:elsewhere:3", b"1", 60)
+
+    async def run():
+        task = asyncio.create_task(main._peer_loop())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+    assert limiter.peers == 3
+    assert limiter.max_rate == pytest.approx(40 / 3)
+
+    assert main._peer_lease(0) == 2
+
+
+def test_penalize_halves_the_rate_down_to_the_floor():
+    limiter = main.TokenBucketLimiter(32, 10)
+    limiter.penalize(0)
+    assert limiter.rate == 16
+    assert limiter.tokens == 0
+    for _ in range(10):
+        limiter.penalize(0)
+    assert limiter.rate == limiter.min_rate == 2
+
+
+def test_penalize_pauses_for_retry_after():
+    limiter = main.TokenBucketLimiter(40, 10)
+    limiter.penalize(30)
+    assert 29 < limiter.snapshot()["paused_for"] <= 30
+    with pytest.raises(main.TMDBThrottled) as exc:
+        asyncio.run(limiter.acquire(max_wait=1))
+    assert exc.value.retry_after > 29
+
+
+def test_reward_grows_the_rate_additively_up_to_max():
+    limiter = main.TokenBucketLimiter(50, 10)
+    limiter.penalize(0)
+    limiter.reward()
+    assert limiter.rate == 26
+    for _ in range(100):
+        limiter.reward()
+    assert limiter.rate == 50
+
+
+def test_background_leaves_the_reserve():
+    limiter = main.TokenBucketLimiter(1, 5, reserve=3)
+    limiter.tokens = 3.5
+    with pytest.raises(main.TMDBThrottled):
+        asyncio.run(limiter.acquire(main.LANE_BACKGROUND, max_wait=0))
+    asyncio.run(limiter.acquire(main.LANE_INTERACTIVE, max_wait=0))
+
+
+def test_background_yields_to_queued_interactive_callers():
+    limiter = main.TokenBucketLimiter(100, 1)
+    limiter.tokens = 0.0
+    order = []
+
+    async def take(lane):
+        await limiter.acquire(lane)
+        order.append(lane)
+
+    async def run():
+        background = asyncio.create_task(take(main.LANE_BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = [asyncio.create_task(take(main.LANE_INTERACTIVE)) for _ in range(3)]
+        await asyncio.gather(background, *interactive)
+
+    asyncio.run(run())
+    assert order == [main.LANE_INTERACTIVE] * 3 + [main.LANE_BACKGROUND]
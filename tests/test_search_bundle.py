@@ -0,0 +1,98 @@
+from collections import Counter
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+MOVIE = {"id": 550, "title": "Fight Club", "poster_path": "/p.jpg", "genres": [{"id": 18, "name": "Drama"}]}
+DISCOVER = {"results": [
+    {"id": 551, "title": "Drama One", "poster_path": "/a.jpg", "genre_ids": [18], "popularity": 9.0},
+    {"id": 552, "title": "Drama Two", "poster_path": "/b.jpg", "genre_ids": [18], "popularity": 5.0},
+]}
+
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    seen = Counter()
+
+    async def fake_tmdb_get(path, params):
+        seen[path] += 1
+        if path == "/search/movie":
+            return {"results": [MOVIE]}
+        if path == "/movie/550":
+            return MOVIE
+        if path == "/discover/movie":
+            return DISCOVER
+        raise AssertionError(f"unexpected tmdb call {path}")
+
+    monkeypatch.setattr(main, "tmdb_get", fake_tmdb_get)
+    monkeypatch.setattr(main, "GENRE_INDEX", main.GenreIndex(str(tmp_path / "genres.json")))
+    return seen
+
+
+def test_cold_bundle_fetches_details_once(calls):
+    with TestClient(main.app) as client:
+        r = client.get("/movie/search", params={"query": "Fight Club"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["movie_details"]["tmdb_id"] == 550
+    assert [c["tmdb_id"] for c in body["genre_recommendations"]] == [551, 552]
+    assert calls["/movie/550"] == 1
+    assert calls["/discover/movie"] == 1
+
+
+@pytest.fixture
+def comedy_fails(calls, monkeypatch):
+    movie = {**MOVIE, "genres": [{"id": 18, "name": "Drama"}, {"id": 35, "name": "Comedy"}]}
+    fake = main.tmdb_get
+
+    async def fake_tmdb_get(path, params):
+        if path == "/movie/550":
+            calls[path] += 1
+            return movie
+        if path == "/discover/movie" and params["with_genres"] == 35:
+            calls["/discover/movie:35"] += 1
+            raise main.HTTPException(status_code=502, detail="TMDB 500")
+        return await fake(path, params)
+
+    monkeypatch.setattr(main, "tmdb_get", fake_tmdb_get)
+    return calls
+
+
+def test_failed_genre_is_left_out_of_the_blend(comedy_fails):
+    with TestClient(main.app) as client:
+        r = client.get("/recommend/genre", params={"tmdb_id": 550})
+    assert r.status_code == 200
+    assert [c["tmdb_id"] for c in r.json()] == [551, 552]
+    assert "genre" in r.headers.get("X-Partial-Sections", "")
+    assert comedy_fails["/discover/movie:35"] == 1
+
+
+def test_genre_fails_only_when_no_genre_answers(calls, monkeypatch):
+    async def fake_tmdb_get(path, params):
+        if path == "/movie/550":
+            return MOVIE
+        raise main.HTTPException(status_code=502, detail="TMDB 500")
+
+    monkeypatch.setattr(main, "tmdb_get", fake_tmdb_get)
+    with TestClient(main.app) as client:
+        r = client.get("/recommend/genre", params={"tmdb_id": 550})
+    assert r.status_code == 502
+
+
+def test_bundle_survives_a_failed_genre_section(calls, monkeypatch):
+    async def fake_tmdb_get(path, params):
+        if path == "/discover/movie":
+            raise main.HTTPException(status_code=502, detail="TMDB 500")
+        return {"results": [MOVIE]} if path == "/search/movie" else MOVIE
+
+    monkeypatch.setattr(main, "tmdb_get", fake_tmdb_get)
+    with TestClient(main.app) as client:
+        r = client.get("/movie/search", params={"query": "Fight Club"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["movie_details"]["tmdb_id"] == 550
+    assert body["genre_recommendations"] == []
+    assert "genre" in r.headers.get("X-Partial-Sections", "")
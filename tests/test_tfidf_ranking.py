@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+import main
+
+
+class RecordingKV:
+    """in-memory shared tier that remembers which thread touched it"""
+
+    remote = False
+
+    def __init__(self):
+        self.data = {}
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return self.data.get(key)
+
+    def set(self, key, value, ttl):
+        self.threads.append(threading.get_ident())
+        self.data[key] = value
+
+
+@pytest.fixture
+def kv(monkeypatch):
+    rows = np.array([[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.0, 1.0, 0.0], [0.5, 0.5, 0.0]])
+    rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+    backend = RecordingKV()
+    monkeypatch.setattr(main, "tfidf_matrix", sparse.csr_matrix(rows))
+    monkeypatch.setattr(main, "ARTIFACT_VERSION", "test")
+    monkeypatch.setattr(main, "SHARED_CACHE", main.SharedCache(backend))
+    monkeypatch.setattr(main, "_TFIDF_RANKINGS", main.OrderedDict())
+    return backend
+
+
+def test_shared_tier_runs_off_the_event_loop(kv):
+    async def rank():
+        loop_thread = threading.get_ident()
+        order, scores = await main.tfidf_ranking(0)
+        return loop_thread, order, scores
+
+    loop_thread, order, scores = asyncio.run(rank())
+    assert order.tolist() == [1, 3, 2]
+    assert scores[0] > scores[1] > scores[2]
+    assert len(kv.threads) == 2  # miss , then publish
+    assert loop_thread not in kv.threads
+
+
+def test_ranking_is_restored_from_the_shared_tier(kv):
+    first = asyncio.run(main.tfidf_ranking(0))
+    main._TFIDF_RANKINGS.clear()
+    main.tfidf_matrix = None  # a recompute would fail
+
+    order, scores = asyncio.run(main.tfidf_ranking(0))
+    assert order.tolist() == first[0].tolist()
+    np.testing.assert_allclose(scores, first[1])
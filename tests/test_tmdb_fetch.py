@@ -0,0 +1,82 @@
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """scripted _tmdb_send: each entry is a status code or (delay , status)"""
+    script = []
+    sent = []
+
+    async def fake_send(url, q, lane, max_wait, timeout):
+        await main.TMDB_LIMITER.acquire(lane, max_wait=max_wait)
+        step = script.pop(0)
+        delay, status = step if isinstance(step, tuple) else (0.0, step)
+        sent.append(status)
+        await asyncio.sleep(delay)
+        headers = {"Retry-After": "120"} if status == 429 else {}
+        return httpx.Response(status, json={"status": status}, headers=headers)
+
+    monkeypatch.setattr(main, "_tmdb_send", fake_send)
+    monkeypatch.setattr(main, "TMDB_LIMITER", main.TokenBucketLimiter(1000, 100))
+    monkeypatch.setattr(main, "TMDB_METRICS", Counter())
+    monkeypatch.setattr(main, "_TMDB_LATENCIES", {})
+    monkeypatch.setattr(main, "TMDB_RETRY_BACKOFF", 0.0)
+    monkeypatch.setattr(main, "TMDB_HEDGE_DEFAULT_DELAY", 5.0)
+    return script, sent
+
+
+def fetch():
+    return asyncio.run(main._tmdb_fetch("/movie/550", {}))
+
+
+def test_long_retry_after_becomes_a_503(upstream):
+    script, sent = upstream
+    script.append(429)
+    with pytest.raises(HTTPException) as exc:
+        fetch()
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "120"
+    assert sent == [429]  # not retried
+    assert main.TMDB_LIMITER.rate == 500
+
+
+def test_5xx_is_retried(upstream):
+    script, sent = upstream
+    script.extend([502, 503, 200])
+    assert fetch().status_code == 200
+    assert sent == [502, 503, 200]
+    assert main.TMDB_METRICS["retries"] == 2
+
+
+def test_retries_are_bounded(upstream, monkeypatch):
+    script, sent = upstream
+    monkeypatch.setattr(main, "TMDB_MAX_RETRIES", 1)
+    script.extend([500, 500, 200])
+    with pytest.raises(HTTPException) as exc:
+        fetch()
+    assert exc.value.status_code == 502
+    assert sent == [500, 500]
+
+
+def test_client_errors_are_returned_as_is(upstream):
+    script, sent = upstream
+    script.append(404)
+    assert fetch().status_code == 404
+    assert sent == [404]
+
+
+def test_hedge_wins_over_a_slow_primary(upstream, monkeypatch):
+    script, sent = upstream
+    monkeypatch.setattr(main, "TMDB_HEDGE_DEFAULT_DELAY", 0.02)
+    script.extend([(2.0, 200), (0.0, 200)])
+    r = fetch()
+    assert r.status_code == 200
+    assert main.TMDB_METRICS["hedges"] == 1
+    assert main.TMDB_METRICS["hedge_wins"] == 1